@@ -1,19 +1,31 @@
-from flask import Flask, request, render_template, redirect, url_for, session, send_file
+from flask import Flask, request, render_template, redirect, url_for, session, send_file, jsonify, Response
 import logging
 import os
-from itsdangerous import URLSafeSerializer
-from forms import SignUp, Login, DataEntryForm, UserEdit, UserFullEdit, FetchExcel, FetchTableData, SubmitData, DeleteRow
-from flask_wtf.csrf import CSRFProtect
+from itsdangerous import URLSafeSerializer, BadSignature
+from forms import SignUp, Login, DataEntryForm, UserEdit, UserFullEdit, FetchExcel, FetchExcelRange, FetchTableData, SubmitData, DeleteRow
+from flask_wtf.csrf import CSRFProtect, CSRFError, generate_csrf
 from db import get_db, close_db
-from constants import FLASK_SECRET_KEY, CURRENT_WORKING_DIRECTORY, COLUMN_MAP, SAFE_HEADERS, ADMIN_ENDPOINTS, DISPLAY_COLUMNS, ID_FERNET_KEY, IS_PRODUCTION, CLIENT_NAMES, INPUT_TYPE_SUBTYPES
+from databaseManagement import get_pool
+import psycopg2
+from psycopg2.pool import PoolError
+from ledgerCache import ledger_cache, get_version, bump_versions, bump_versions_for_ids
+from reportCache import report_cache, artifact_key
+from entryExport import open_export, ExportBusy, EXPORT_COLUMNS, EXPORT_ORDER, EXPORT_MIMETYPES
+from dailyTotals import refresh_daily_totals, get_totals
+from constants import FLASK_SECRET_KEY, COLUMN_MAP, SAFE_HEADERS, ADMIN_ENDPOINTS, DISPLAY_COLUMNS, IS_PRODUCTION, CLIENT_NAMES, INPUT_TYPE_SUBTYPES, INPUT_INSERT_COLUMNS, EXCEL_STREAMING_MIN_ROWS, EXCEL_RANGE_MAX_DAYS, EXPORT_RANGE_MAX_DAYS, REPORT_ASYNC_MIN_ROWS, REPORTS_PRELOAD, LOG_DIRECTORY, LEDGER_PAGE_SIZE, LEDGER_PAGE_MAX
 from datetime import datetime, timedelta
-from excelOrchestration import generate_excel
-import bcrypt
+from reportJobs import submit_job, get_job, get_artifact_path
+from asyncLogging import setup_logging, logging_stats
+import metrics
+import sharedState  # registers the nisapp:// limiter storage
+from sessionVersions import session_versions
+from passwordHashing import hash_password, check_password, rehash_if_needed, PasswordHasherBusy
+import passwordHashing
 import json
 from io import BytesIO
-from cryptography.fernet import Fernet
-from validators import validate_table_data, ValidationError
-from util import sanitise_input, is_valid_date, group_by_type_subtype, trim_column_map, build_db_data
+from idTokens import decode_id
+from validators import get_plan, validate_table, ValidationError
+from util import is_valid_date, group_by_type_subtype, trim_column_map, build_db_data, build_db_data_by_date, REPORT_COLUMNS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import re
@@ -28,6 +40,7 @@ app.config.update(
     WTF_CSRF_SSL_STRICT=IS_PRODUCTION,
     WTF_CSRF_TIME_LIMIT=10800
     )
+metrics.init_app(app)
 
 serializer = URLSafeSerializer(FLASK_SECRET_KEY)
 csrf = CSRFProtect(app)
@@ -35,32 +48,22 @@ csrf = CSRFProtect(app)
 limiter = Limiter(
     key_func=get_remote_address,
     app=app,
-    storage_uri="memory://"
+    storage_uri="nisapp://"
 )
 
-# Set of usernames pending forced logout (cleared after logout) (kind of a bad idea)
-pending_logout = set()
-
 app.teardown_appcontext(close_db)
 
-log_directory = os.path.join(CURRENT_WORKING_DIRECTORY, 'logs')
-if not os.path.exists(log_directory):
-    os.makedirs(log_directory)
-
-log_file_path = os.path.join(log_directory, datetime.today().strftime('%d-%m-%Y')+'-logs.log')
-
+setup_logging()
 logger = logging.getLogger()
-file_handler = logging.FileHandler(log_file_path)
-
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
-file_handler.setFormatter(formatter)
-
-logger.setLevel(logging.INFO)
-logger.addHandler(file_handler)
+logger.info(f"Logs are being saved to: {LOG_DIRECTORY}")
 
 werkzeug_logger = logging.getLogger('werkzeug')
 werkzeug_logger.disabled = True 
 
+# The Excel modules are imported inside the export routes and report jobs
+if REPORTS_PRELOAD:
+    import excelReports
+
 @app.after_request
 def add_security_headers(response):
     response.headers['X-Content-Type-Options'] = 'nosniff'
@@ -85,17 +88,24 @@ def pre_request():
     if request.endpoint is None:
         return
     
-    headers = ", ".join(f"{k}: {v}" for k, v in request.headers.items() if k in SAFE_HEADERS)
-    logger.info(f"New request from IP: {get_client_ip()}, Headers: {headers}, Method: {request.method}, Path: {request.path}\n")
+    logger.info("New request", extra={
+        "ip": get_client_ip(),
+        "method": request.method,
+        "path": request.path,
+        "headers": {k: v for k, v in request.headers.items() if k in SAFE_HEADERS}
+    })
     
-    if session.get("username", None) and session.get("username", None) in pending_logout:
+    if session.get("username", None) and request.endpoint != "static" and not session_versions.is_current(get_db, session.get("username"), session.get("session_version", 1)):
         username_to_logout = session.get("username")
-        pending_logout.discard(username_to_logout)
         session.clear()
         session["message"] = "Your account was updated by an administrator. Please log in again."
         logger.info(f"User {username_to_logout} force-logged out due to account changes from IP: {get_client_ip()}")
+        if is_api_request():
+            return api_error("Session expired, please log in again", 401)
         return redirect(url_for("login"))
     if session.get("username", None) is None and request.endpoint not in ["login", "static", 'logout']:
+        if is_api_request():
+            return api_error("Authentication required", 401)
         logger.info(f"Redirecting to login from IP: {get_client_ip()}")
         return redirect(url_for("login"))
     if session.get("username", None) is not None and request.endpoint in ["login"]:
@@ -105,10 +115,6 @@ def pre_request():
         logger.warning(f"User {session.get('username', None)} Tried to log into admin endpoint {request.endpoint}, redirecting to dataentry from IP: {get_client_ip()}")
         return redirect(url_for("dataentry"))
 
-for handler in logging.getLogger().handlers:
-    if isinstance(handler, logging.FileHandler):
-        print(f"Logs are being saved to: {handler.baseFilename}")
-
 def get_client_ip():
     if request.headers.get('True-Client-IP'):
         return request.headers.get('True-Client-IP')
@@ -121,6 +127,14 @@ def get_client_ip():
         return ips[0]
     return request.remote_addr
 
+ACTIVE_USER_SQL = "SELECT * FROM NisUsers WHERE Username = %s AND is_active = TRUE LIMIT 1"
+ANY_USER_SQL = "SELECT * FROM NisUsers WHERE Username = %s LIMIT 1"
+ACTIVE_USERS_SQL = "SELECT username AS \"Username\", name AS \"Name\", role AS \"Role\" FROM NisUsers WHERE is_active = TRUE"
+REHASH_PASSWORD_SQL = "UPDATE NisUsers SET password = %s WHERE Username = %s AND password = %s"
+DEACTIVATE_USER_SQL = "UPDATE NisUsers SET is_active = FALSE, session_version = session_version + 1 WHERE Username = %s"
+EDIT_USER_SQL = "UPDATE NisUsers SET name = %s, role = %s, session_version = session_version + 1 WHERE Username = %s AND is_active = TRUE RETURNING session_version"
+EDIT_USER_PASSWORD_SQL = "UPDATE NisUsers SET name = %s, role = %s, password = %s, session_version = session_version + 1 WHERE Username = %s AND is_active = TRUE RETURNING session_version"
+
 @app.route('/', methods=['GET', 'POST'])
 @app.route('/login', methods=['GET', 'POST'])
 @limiter.limit("20 per minute")
@@ -133,14 +147,18 @@ def login():
         password = form.Password.data
         logger.info(f"Attempting login for {username} from IP: {get_client_ip()}")
         
-        query = db.select(
-    "SELECT * FROM NisUsers WHERE Username = %s AND is_active = TRUE LIMIT 1",
-    (username,)
-)
+        query = db.select(ACTIVE_USER_SQL, (username,))
         
         if len(query) != 0:
             
-            if bcrypt.checkpw(password.encode(), query[0]['password'].encode()):
+            try:
+                password_ok = check_password(password, query[0]['password'])
+            except PasswordHasherBusy:
+                session["error"] = "Server is busy, please try again in a few seconds"
+                logger.warning(f"Login for {username} turned away, password hashing is saturated, from IP: {get_client_ip()}")
+                return redirect(url_for("login"))
+            
+            if password_ok:
                 session.clear()
                 session.permanent = True
                 session["username"] = query[0]["username"]
@@ -150,7 +168,20 @@ def login():
                 else:
                     session["admin"] = 0
                 
-                pending_logout.discard(query[0]["username"])
+                session["session_version"] = query[0]["session_version"]
+                
+                try:
+                    new_hash = rehash_if_needed(password, query[0]['password'])
+                    if new_hash:
+                        db.execute(REHASH_PASSWORD_SQL, (new_hash, query[0]["username"], query[0]["password"]))
+                        db.commit()
+                        logger.info(f"Password hash for {query[0]['username']} upgraded to the current cost factor")
+                except PasswordHasherBusy:
+                    logger.info(f"Skipped password rehash for {query[0]['username']}, hashing is busy")
+                except Exception:
+                    # Best effort: the login itself has already succeeded
+                    db.rollback()
+                    logger.exception(f"Password rehash for {query[0]['username']} failed")
                 
                 logger.info(f"User {session['username']} logged in successfully from IP: {get_client_ip()}")
                 return redirect(url_for('dataentry'))
@@ -185,31 +216,13 @@ def dataentry():
     if form.is_submitted():
         if form.validate_on_submit():
             try:
-                forminput_type = form.input_type.data
-                formType = form.type.data
-                formSubtype = form.subtype.data
-                tableData = json.loads(form.rowData.data)
-
-                if forminput_type not in INPUT_TYPE_SUBTYPES or formSubtype not in INPUT_TYPE_SUBTYPES[forminput_type]:
-                    raise ValidationError(f"Invalid subtype '{formSubtype}' for input type '{forminput_type}'")
-
-                if formType not in COLUMN_MAP or formSubtype not in COLUMN_MAP[formType]:
-                    raise ValidationError(f"Invalid type/subtype combination: '{formType}'/'{formSubtype}'")
-
-                allowed_columns = COLUMN_MAP[formType][formSubtype]
-                validate_table_data(tableData, allowed_columns)
-
-                columns = [c["name"].lower() for c in allowed_columns]
-                idx = {sanitise_input(name): i for i, name in enumerate(columns)}
-                for row in tableData["data"]:
-                    db.execute("""INSERT INTO Input(type, subtype, amount, receipts, date_for, submitted_by, input_type) VALUES (%s, %s, %s, %s, %s, %s, %s)""",(formType, formSubtype, row[idx["amount"]], row[idx["receipts"]], row[idx["date"]], session["username"], forminput_type))
-
+                insert_entries(db, form.input_type.data, form.type.data, form.subtype.data, json.loads(form.rowData.data), session["username"])
                 db.commit() 
                 session["message"] = "Data submitted successfully"
 
             except ValidationError as e:
                 db.rollback()
-                session["error"] = str(e)
+                session["error"] = e.errors if len(e.errors) > 1 else str(e)
 
             except ValueError:
                 db.rollback()
@@ -232,6 +245,22 @@ def dataentry():
     message = session.pop("message", None)
     return render_template("dataentry.html", form=form, columns=COLUMN_MAP, error=error, message=message, client_names=CLIENT_NAMES, input_type_subtypes=INPUT_TYPE_SUBTYPES)
     
+def insert_entries(db, input_type, entry_type, subtype, table_data, username):
+    if input_type not in INPUT_TYPE_SUBTYPES or subtype not in INPUT_TYPE_SUBTYPES[input_type]:
+        raise ValidationError(f"Invalid subtype '{subtype}' for input type '{input_type}'")
+
+    plan = get_plan(entry_type, subtype)
+    if plan is None:
+        raise ValidationError(f"Invalid type/subtype combination: '{entry_type}'/'{subtype}'")
+
+    rows = [(entry_type, subtype, amount, receipts, date_for, username, input_type) for amount, receipts, date_for in validate_table(table_data, plan)]
+    db.insert_rows("input", INPUT_INSERT_COLUMNS, rows)
+    touched_dates = [row[4] for row in rows]
+    bump_versions(db, touched_dates)
+    report_cache.discard_dates(touched_dates)
+    refresh_daily_totals(db, touched_dates)
+    return len(rows), sorted(set(touched_dates))
+
 @app.route("/manageuser", methods = ["GET", "POST"])
 def manageuser():
     form = SignUp()
@@ -239,9 +268,7 @@ def manageuser():
     formEdit = UserFullEdit()
     db = get_db()
     
-    userList = db.select(
-    "SELECT username AS \"Username\", name AS \"Name\", role AS \"Role\" FROM NisUsers WHERE is_active = TRUE"
-)
+    userList = db.select(ACTIVE_USERS_SQL)
 
     filtered_users = [
             {k: v for k, v in user.items()}
@@ -262,10 +289,14 @@ def manageuser():
     logger.info(f"Create User accessed by {session.get('username')} from IP: {get_client_ip()}")
     if form.is_submitted():
         if form.validate_on_submit():
-            if len(db.select("SELECT * FROM NisUsers WHERE Username = %s LIMIT 1",(form.Username.data,)))!= 0:
+            if len(db.select(ANY_USER_SQL, (form.Username.data,)))!= 0:
                 session["error"] = "Username already exists (or was previously used)"
                 return redirect(url_for("manageuser"))
-            hashed_pass = bcrypt.hashpw(form.Password.data.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+            try:
+                hashed_pass = hash_password(form.Password.data)
+            except PasswordHasherBusy:
+                session["error"] = "Server is busy, please try again in a few seconds"
+                return redirect(url_for("manageuser"))
             try:
                 db.execute("""INSERT INTO nisusers(Username, Name, Password, role, is_active) VALUES (%s, %s, %s, %s, TRUE)""", (form.Username.data, form.Name.data, hashed_pass, form.Role.data))
                 db.commit()
@@ -301,14 +332,11 @@ def delete_user():
             session["error1"] = "You cannot deactivate yourself."
             return redirect(url_for("manageuser"))
 
-        db.execute(
-            "UPDATE NisUsers SET is_active = FALSE WHERE Username = %s",
-            (form.Username.data,)
-        )
+        db.execute(DEACTIVATE_USER_SQL, (form.Username.data,))
         db.commit()
+        session_versions.invalidate(form.Username.data)
         
-        pending_logout.add(form.Username.data)
-        logger.info(f"User {form.Username.data} deactivated and added to pending logout list")
+        logger.info(f"User {form.Username.data} deactivated and their sessions revoked")
         
         session["message1"] = "User deactivated successfully."
 
@@ -338,22 +366,22 @@ def edit_user():
         
         try:
             if new_password and len(new_password) >= 8:
-                hashed_pass = bcrypt.hashpw(new_password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
-                db.execute(
-                    "UPDATE NisUsers SET name = %s, role = %s, password = %s WHERE Username = %s AND is_active = TRUE",
-                    (new_name, new_role, hashed_pass, original_username)
-                )
+                hashed_pass = hash_password(new_password)
+                updated = db.select(EDIT_USER_PASSWORD_SQL, (new_name, new_role, hashed_pass, original_username))
             else:
-                db.execute(
-                    "UPDATE NisUsers SET name = %s, role = %s WHERE Username = %s AND is_active = TRUE",
-                    (new_name, new_role, original_username)
-                )
+                updated = db.select(EDIT_USER_SQL, (new_name, new_role, original_username))
             db.commit()
+            session_versions.invalidate(original_username)
             logger.info(f"User {original_username} updated by {session.get('username')} from IP: {get_client_ip()}")
             session["message1"] = f"User {original_username} updated successfully."
-            if original_username != session.get("username"):
-                pending_logout.add(original_username)
-                logger.info(f"User {original_username} added to pending logout list")
+            if original_username == session.get("username") and updated:
+                # An admin editing themselves stays logged in
+                session["session_version"] = updated[0]["session_version"]
+            else:
+                logger.info(f"User {original_username} sessions revoked")
+        except PasswordHasherBusy:
+            db.rollback()
+            session["error1"] = "Server is busy, please try again in a few seconds"
         except Exception as e:
             db.rollback()
             logger.exception("User update failed")
@@ -363,6 +391,70 @@ def edit_user():
     
     return redirect(url_for("manageuser"))
 
+def excel_column_map(is_admin, user_type):
+    if is_admin:
+        return trim_column_map(COLUMN_MAP, {"date"})
+    filtered_column_map = {k: v for k, v in COLUMN_MAP.items() if k.upper() == user_type}
+    return trim_column_map(filtered_column_map, {"date"})
+
+def role_filter(is_admin, user_type):
+    # -> (SQL condition to AND onto a query of input, its params); non-admins only see their own type
+    if is_admin:
+        return "", ()
+    return " AND UPPER(type) = %s", (user_type,)
+
+# Query builders -> (sql, params); benchmarks/check_query_plans.py explains these
+def day_report_query(date_for, is_admin, user_type):
+    condition, params = role_filter(is_admin, user_type)
+    return f"SELECT {REPORT_COLUMNS} FROM input WHERE date_for = %s{condition}", (date_for, *params)
+
+def range_report_query(start_date, end_date, is_admin, user_type):
+    condition, params = role_filter(is_admin, user_type)
+    return f"SELECT {REPORT_COLUMNS}, date_for FROM input WHERE date_for BETWEEN %s AND %s{condition}", (start_date, end_date, *params)
+
+def export_query(start_date, end_date, is_admin, user_type):
+    condition, params = role_filter(is_admin, user_type)
+    return f"SELECT {EXPORT_COLUMNS} FROM input WHERE date_for BETWEEN %s AND %s{condition} ORDER BY {EXPORT_ORDER}", (start_date, end_date, *params)
+
+LEDGER_ORDER = "COALESCE(input_type, ''), type, subtype, id"
+LEDGER_COLUMNS = (
+    "id, input_type, type, subtype, amount, receipts, date_for, submitted_by, "
+    "to_char(created_at, 'DD Mon YYYY HH24:MI') AS created_at, to_char(updated_at, 'DD Mon YYYY HH24:MI') AS updated_at"
+)
+
+def encode_ledger_cursor(row):
+    return serializer.dumps([row["input_type"] or "", row["type"], row["subtype"], row["id"]], salt="ledger-cursor")
+
+def decode_ledger_cursor(cursor):
+    # -> (input_type, type, subtype, id); raises BadSignature/ValueError on tampering
+    input_type, entry_type, subtype, row_token = serializer.loads(cursor, salt="ledger-cursor")
+    return input_type, entry_type, subtype, decode_id(row_token)
+
+def ledger_page_query(date_for, is_admin, user_type, after_key=None, limit=LEDGER_PAGE_SIZE):
+    # after_key: (input_type, type, subtype, id) of the last row already shown;
+    # one extra row is fetched to tell whether there is a next page
+    conditions = ["date_for = %s"]
+    params = [date_for]
+    if not is_admin:
+        conditions.append("UPPER(type) = %s")
+        params.append(user_type)
+    if after_key:
+        conditions.append(f"({LEDGER_ORDER}) > (%s, %s, %s, %s)")
+        params.extend(after_key)
+    params.append(limit + 1)
+    return f"SELECT {LEDGER_COLUMNS} FROM input WHERE {' AND '.join(conditions)} ORDER BY {LEDGER_ORDER} LIMIT %s", params
+
+def load_ledger_page(db, date_for, is_admin, user_type, after=None, limit=LEDGER_PAGE_SIZE):
+    # Keyset page in (input_type, type, subtype, id) order; rowspans are computed
+    # for the page alone. -> (rows, cursor for the next page or None)
+    rows = db.select(*ledger_page_query(date_for, is_admin, user_type, decode_ledger_cursor(after) if after else None, limit))
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    with metrics.phase("group"):
+        page = group_by_type_subtype(rows)
+    return page, encode_ledger_cursor(page[-1]) if has_more else None
+
 @app.route("/manageexcel", methods = ["GET", "POST"])
 def manageexcel():
     db = get_db()
@@ -370,17 +462,27 @@ def manageexcel():
     formDate = FetchTableData()
     formSubmitTable = SubmitData()
     formDeleteRow = DeleteRow()
+    formRange = FetchExcelRange()
     
     is_admin = session.get("admin") == 1
     user_type = session.get("user_name", "").upper() 
     
-    storedDate = session.pop("fetchingDate", datetime.today().date().isoformat())
+    storedDate = session.pop("fetchingDate", None) or request.args.get("date") or datetime.today().date().isoformat()
+    page_after = request.args.get("after")
+    next_page = None
+    if not is_valid_date(storedDate):
+        storedDate = datetime.today().date().isoformat()
     if storedDate:
         formDate.FetchingDate.data = storedDate
-        if is_admin:
-            tableData = group_by_type_subtype(db.select("SELECT * FROM input WHERE date_for = %s", (formDate.FetchingDate.data,)))
-        else:
-            tableData = group_by_type_subtype(db.select("SELECT * FROM input WHERE date_for = %s AND UPPER(type) = %s", (formDate.FetchingDate.data, user_type)))
+        try:
+            tableData, next_page = ledger_cache.get_or_load(
+                db,
+                storedDate,
+                f"{'admin' if is_admin else f'type={user_type}'}:page={page_after}:{LEDGER_PAGE_SIZE}",
+                lambda: load_ledger_page(db, storedDate, is_admin, user_type, page_after)
+            )
+        except (BadSignature, ValueError):
+            return redirect(url_for("manageexcel", date=storedDate))
         
     if form.validate_on_submit():
         try:
@@ -389,32 +491,166 @@ def manageexcel():
             session["error"] = "Invalid date format"
             return redirect(url_for("manageexcel"))
         
-        if is_admin:
-            tableData = db.select("SELECT * FROM input WHERE date_for = %s", (formDate.FetchingDate.data,))
-            column_map_for_excel = trim_column_map(COLUMN_MAP, {"date"})
-        else:
-            tableData = db.select("SELECT * FROM input WHERE date_for = %s AND UPPER(type) = %s", (formDate.FetchingDate.data, user_type))
-
-            filtered_column_map = {k: v for k, v in COLUMN_MAP.items() if k.upper() == user_type}
-            column_map_for_excel = trim_column_map(filtered_column_map, {"date"})
-        
-        report_date = datetime.strptime(formDate.FetchingDate.data, "%Y-%m-%d").strftime("%d-%m-%Y")
-        ws = generate_excel(column_map_for_excel, build_db_data(tableData), report_date)
-        output = BytesIO()
-        ws.save(output)
-        output.seek(0)
-        filename = f"expense_{formDate.FetchingDate.data}.xlsx"
-        
-        return send_file(
-        output,
-        as_attachment=True,
-        download_name=filename,
-        mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-        )
+        return export_day_register(db, formDate.FetchingDate.data, is_admin, user_type)
 
     error = session.pop("error", None)
     message = session.pop("message", None)
-    return render_template("excel.html", form=form, formDate=formDate, tableData=tableData, error=error, message=message, columns = DISPLAY_COLUMNS, formSubmitTable=formSubmitTable, formDeleteRow = formDeleteRow, is_admin=is_admin)
+    report_job = session.pop("report_job", None)
+    prepare_report = request.args.get("prepare") == "1"
+    return render_template("excel.html", report_job=report_job, prepare_report=prepare_report, next_page=next_page, page_after=page_after, form=form, formDate=formDate, tableData=tableData, error=error, message=message, columns = DISPLAY_COLUMNS, formSubmitTable=formSubmitTable, formDeleteRow = formDeleteRow, formRange=formRange, is_admin=is_admin)
+
+@app.route("/manageexcel/download", methods = ["GET"])
+def exceldownload():
+    try:
+        date_for = datetime.strptime(request.args.get("date", ""), "%Y-%m-%d").date().isoformat()
+    except ValueError:
+        session["error"] = "Invalid date format"
+        return redirect(url_for("manageexcel"))
+    is_admin = session.get("admin") == 1
+    user_type = session.get("user_name", "").upper()
+    return export_day_register(get_db(), date_for, is_admin, user_type, submit_jobs=False)
+
+def export_day_register(db, date_for, is_admin, user_type, submit_jobs=True):
+    # submit_jobs=False (GET): large reports go back to the page to be started by a POST
+    column_map_for_excel = excel_column_map(is_admin, user_type)
+    filename = f"expense_{date_for}.xlsx"
+    key = None
+    if report_cache.enabled:
+        key = artifact_key(date_for, "admin" if is_admin else f"type={user_type}", column_map_for_excel, get_version(db, date_for))
+        cached = report_cache.open(date_for, key)
+        if cached is not None:
+            return send_register(cached, filename, key)
+
+    tableData = db.select_tuples(*day_report_query(date_for, is_admin, user_type))
+
+    report_date = datetime.strptime(date_for, "%Y-%m-%d").strftime("%d-%m-%Y")
+    if len(tableData) >= REPORT_ASYNC_MIN_ROWS:
+        if not submit_jobs:
+            return redirect(url_for("manageexcel", date=date_for, prepare=1))
+        session["report_job"] = submit_job(session.get("username"), filename, "day", (column_map_for_excel, build_db_data(tableData), report_date))
+        session["message"] = "Large report is being prepared, it will be ready to download shortly"
+        session["fetchingDate"] = date_for
+        return redirect(url_for("manageexcel"))
+
+    with metrics.phase("excel"):
+        from excelOrchestration import generate_excel
+        from excelStreaming import generate_excel_streaming, save_to_tempfile
+        if len(tableData) >= EXCEL_STREAMING_MIN_ROWS:
+            wb = generate_excel_streaming(column_map_for_excel, build_db_data(tableData), report_date)
+        else:
+            wb = generate_excel(column_map_for_excel, build_db_data(tableData), report_date)
+        if key is not None:
+            output = report_cache.store(date_for, key, wb.save)
+        elif wb.write_only:
+            output = save_to_tempfile(wb)
+        else:
+            output = BytesIO()
+            wb.save(output)
+            output.seek(0)
+
+    return send_register(output, filename, key)
+
+def send_register(output, filename, etag=None):
+    response = send_file(
+    output,
+    as_attachment=True,
+    download_name=filename,
+    mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    etag=etag or False,
+    conditional=etag is not None
+    )
+    if etag:
+        # Per-user data; browsers may keep it but must check the ETag first
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    return response
+
+@app.route("/exportrange", methods = ["POST"])
+def exportrange():
+    form = FetchExcelRange()
+    if not form.validate_on_submit():
+        session["error"] = [f"{field}: {err}" for field, field_errors in form.errors.items() for err in field_errors]
+        return redirect(url_for("manageexcel"))
+
+    start_date = form.StartDate.data
+    end_date = form.EndDate.data
+    if end_date < start_date:
+        session["error"] = "End date must not be before start date"
+        return redirect(url_for("manageexcel"))
+    if (end_date - start_date).days + 1 > EXCEL_RANGE_MAX_DAYS:
+        session["error"] = f"Date range cannot exceed {EXCEL_RANGE_MAX_DAYS} days"
+        return redirect(url_for("manageexcel"))
+
+    db = get_db()
+    is_admin = session.get("admin") == 1
+    user_type = session.get("user_name", "").upper()
+
+    rows = db.iter_tuples(*range_report_query(start_date, end_date, is_admin, user_type))
+    db_data, db_data_by_date, row_count = build_db_data_by_date(rows)
+    logger.info(f"Range export {start_date} to {end_date} ({row_count} rows) requested by {session.get('username')} from IP: {get_client_ip()}")
+
+    per_day = bool(form.PerDay.data)
+    filename = f"expense_{start_date.isoformat()}_{end_date.isoformat()}.xlsx"
+    column_map_for_excel = excel_column_map(is_admin, user_type)
+
+    if row_count >= REPORT_ASYNC_MIN_ROWS:
+        session["report_job"] = submit_job(session.get("username"), filename, "range", (column_map_for_excel, db_data, db_data_by_date, start_date, end_date, per_day))
+        session["message"] = "Large report is being prepared, it will be ready to download shortly"
+        return redirect(url_for("manageexcel"))
+
+    streaming = row_count * (2 if per_day else 1) >= EXCEL_STREAMING_MIN_ROWS
+    with metrics.phase("excel"):
+        from excelReports import generate_excel_range
+        from excelStreaming import save_to_tempfile
+        wb = generate_excel_range(column_map_for_excel, db_data, db_data_by_date, start_date, end_date, per_day, streaming)
+        if streaming:
+            output = save_to_tempfile(wb)
+        else:
+            output = BytesIO()
+            wb.save(output)
+            output.seek(0)
+
+    return send_file(
+    output,
+    as_attachment=True,
+    download_name=filename,
+    mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
+
+def get_visible_job(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return None
+    if job.get("username") != session.get("username") and session.get("admin") != 1:
+        logger.warning(f"User {session.get('username')} tried to access report job {job_id} from IP: {get_client_ip()}")
+        return None
+    return job
+
+@app.route("/reportjobs/<job_id>", methods = ["GET"])
+def reportjob(job_id):
+    job = get_visible_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    result = {"id": job["id"], "status": job["status"], "filename": job["filename"]}
+    if job["status"] == "done":
+        result["download_url"] = url_for("reportjob_download", job_id=job_id)
+    if job["status"] == "failed":
+        result["error"] = "Report generation failed"
+    return jsonify(result)
+
+@app.route("/reportjobs/<job_id>/download", methods = ["GET"])
+def reportjob_download(job_id):
+    job = get_visible_job(job_id)
+    path = get_artifact_path(job_id) if job else None
+    if path is None:
+        session["error"] = "Report is not available"
+        return redirect(url_for("manageexcel"))
+    return send_file(
+    path,
+    as_attachment=True,
+    download_name=job["filename"],
+    mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    )
 
 @app.route("/fetchtable", methods = ["POST"])
 def fetchtable():
@@ -435,11 +671,9 @@ def deleterow():
     
     form = DeleteRow()
     if form.validate():
-        cipher = Fernet(ID_FERNET_KEY)
         db = get_db()
         try:
-            decrypted_id = cipher.decrypt(form.data["rowID"].encode()).decode()
-            db.execute("delete from input where id=%s", (decrypted_id,))
+            delete_entry(db, form.data["rowID"])
             db.commit()
             session["message"] = "Record deleted successfully"
         except Exception as e:
@@ -453,7 +687,97 @@ def deleterow():
         session["fetchingDate"] = datetime.strptime(form.data["date"], "%Y-%m-%d").date().isoformat()
     except (ValueError, TypeError):
         session["fetchingDate"] = datetime.today().date().isoformat()
-    return redirect(url_for("manageexcel"))
+    return redirect(url_for("manageexcel", date=session["fetchingDate"], after=form.data["after"] or None))
+
+DELETE_ENTRY_SQL = "delete from input where id=%s returning date_for"
+UPDATE_ENTRY_SQL = "update input set amount=%s, receipts=%s where id=%s"
+BULK_UPDATE_SQL = "UPDATE input AS i SET amount = v.amount, receipts = v.receipts FROM (VALUES %s) AS v(id, amount, receipts) WHERE i.id = v.id"
+
+def delete_entry(db, row_token):
+    deleted = db.select(DELETE_ENTRY_SQL, (decode_id(row_token),))
+    bump_versions(db, [r["date_for"] for r in deleted])
+    report_cache.discard_dates([r["date_for"] for r in deleted])
+    refresh_daily_totals(db, [r["date_for"] for r in deleted])
+    return len(deleted)
+
+def bulk_update_input(db, updates):
+    # updates: [(id, amount, receipts, row_token)]; applied in one statement,
+    # falling back to row-by-row savepoints to isolate the rows that fail.
+    db.savepoint("bulk_update")
+    try:
+        latest = {row[0]: row[:3] for row in updates}
+        db.execute_many(BULK_UPDATE_SQL, list(latest.values()))
+        db.release_savepoint("bulk_update")
+        return len(updates), 0
+    except Exception as e:
+        logger.warning(f"Bulk record update failed, retrying row by row: error={e}")
+        db.rollback_to_savepoint("bulk_update")
+
+    passed = 0
+    failed = 0
+    for row_id_value, amount, receipts, row_id in updates:
+        db.savepoint("row_update")
+        try:
+            db.execute(UPDATE_ENTRY_SQL, (amount, receipts, row_id_value))
+            db.release_savepoint("row_update")
+            passed += 1
+        except Exception as e:
+            logger.warning(f"Record update failed - DB error: row_id={row_id}, error={e}")
+            db.rollback_to_savepoint("row_update")
+            failed += 1
+    db.release_savepoint("bulk_update")
+    return passed, failed
+
+def parse_row_updates(items):
+    # -> ([(id, amount, receipts, row_token)], [(row_token, error)])
+    updates = []
+    errors = []
+    for i in items:
+        if not i:
+            continue
+        row_id = i.get('id', 'unknown')
+        try:
+            amount = float(i.get('amount', 0))
+            if amount <= 0:
+                logger.warning(f"Record update failed - invalid amount ({amount}): row_id={row_id}")
+                errors.append((row_id, "Amount must be > 0"))
+                continue
+        except (ValueError, TypeError) as e:
+            logger.warning(f"Record update failed - amount parse error ({i.get('amount')}): row_id={row_id}, error={e}")
+            errors.append((row_id, "Invalid amount"))
+            continue
+        
+        receipts = str(i.get('receipts', ''))
+        if len(receipts) > 200:
+            logger.warning(f"Record update failed - receipts too long ({len(receipts)} chars): row_id={row_id}")
+            errors.append((row_id, "Receipts too long"))
+            continue
+        
+        try:
+            decrypted_id = decode_id(i["id"])
+        except Exception as e:
+            logger.warning(f"Record update failed - invalid id: row_id={row_id}, error={e}")
+            errors.append((row_id, "Invalid id"))
+            continue
+
+        updates.append((decrypted_id, amount, receipts, row_id))
+    return updates, errors
+
+def apply_row_updates(db, updates):
+    # Commits; -> (passed, failed)
+    if not updates:
+        return 0, 0
+    try:
+        passed, failed = bulk_update_input(db, updates)
+        touched_dates = bump_versions_for_ids(db, [u[0] for u in updates])
+        report_cache.discard_dates(touched_dates)
+        refresh_daily_totals(db, touched_dates)
+        db.commit()
+        return passed, failed
+    except Exception as e:
+        logger.warning(f"Record update failed - commit error: error={e}")
+        db.rollback()
+        return 0, len(updates)
 
 @app.route("/submittable", methods = ["POST"])
 def submittable():
@@ -464,39 +788,11 @@ def submittable():
     
     form = SubmitData()
     if form.validate():
-        cipher = Fernet(ID_FERNET_KEY)
         tableData = json.loads(form.data["rowData"])
         db = get_db()
-        count_pass=0
-        count_fail=0
-        for i in tableData:
-            if i:
-                row_id = i.get('id', 'unknown')
-                try:
-                    amount = float(i.get('amount', 0))
-                    if amount <= 0:
-                        logger.warning(f"Record update failed - invalid amount ({amount}): row_id={row_id}")
-                        count_fail += 1
-                        continue
-                except (ValueError, TypeError) as e:
-                    logger.warning(f"Record update failed - amount parse error ({i.get('amount')}): row_id={row_id}, error={e}")
-                    count_fail += 1
-                    continue
-                
-                receipts = str(i.get('receipts', ''))
-                if len(receipts) > 200:
-                    logger.warning(f"Record update failed - receipts too long ({len(receipts)} chars): row_id={row_id}")
-                    count_fail += 1
-                    continue
-                
-                try:
-                    db.execute("update input set amount=%s, receipts=%s where id=%s", (amount, receipts, cipher.decrypt(i["id"]).decode()))
-                    db.commit()
-                    count_pass+=1
-                except Exception as e:
-                    logger.warning(f"Record update failed - DB error: row_id={row_id}, error={e}")
-                    db.rollback()
-                    count_fail+=1
+        updates, errors = parse_row_updates(tableData)
+        count_pass, count_fail = apply_row_updates(db, updates)
+        count_fail += len(errors)
         if count_pass>0:
             session["message"] = str(count_pass) + " Record(s) Sucessfully Updated"
         if count_fail>0:
@@ -509,11 +805,219 @@ def submittable():
                 session["fetchingDate"] = datetime.today().date().isoformat()
         except (ValueError, TypeError, IndexError):
             session["fetchingDate"] = datetime.today().date().isoformat()
-        return redirect(url_for("manageexcel"))
+        return redirect(url_for("manageexcel", date=session["fetchingDate"], after=form.data["after"] or None))
     else:
         session['error'] = [err for field_errors in form.errors.values() for err in field_errors]
     return redirect(url_for("manageexcel"))
 
+@app.route("/totals", methods = ["GET"])
+def totals():
+    start = request.args.get("from", "")
+    end = request.args.get("to", start)
+    if not is_valid_date(start) or not is_valid_date(end):
+        return jsonify({"error": "from/to must be dates (YYYY-MM-DD) with from <= to"}), 400
+    start = datetime.strptime(start, "%Y-%m-%d").date().isoformat()
+    end = datetime.strptime(end, "%Y-%m-%d").date().isoformat()
+    if end < start:
+        return jsonify({"error": "from/to must be dates (YYYY-MM-DD) with from <= to"}), 400
+
+    is_admin = session.get("admin") == 1
+    user_type = session.get("user_name", "").upper()
+    result = get_totals(get_db(), start, end, None if is_admin else user_type)
+    result.update({"from": start, "to": end})
+    return jsonify(result)
+
+def is_api_request():
+    return request.path.startswith("/api/")
+
+def api_error(message, status, **extra):
+    return jsonify({"error": message, **extra}), status
+
+def entry_json(row):
+    return {
+        "id": row["id"],
+        "input_type": row.get("input_type"),
+        "type": row["type"],
+        "subtype": row["subtype"],
+        "amount": str(row["amount"]),
+        "receipts": row.get("receipts"),
+        "date_for": row["date_for"].isoformat() if hasattr(row["date_for"], "isoformat") else row["date_for"],
+        "submitted_by": row.get("submitted_by"),
+        "created_at": row.get("created_at"),
+        "updated_at": row.get("updated_at"),
+        "input_type_rowspan": row.get("input_type_rowspan"),
+        "type_rowspan": row.get("type_rowspan"),
+        "subtype_rowspan": row.get("subtype_rowspan"),
+    }
+
+@app.route("/api/v1/session", methods = ["GET"])
+def api_session():
+    # Send the token back as X-CSRFToken on POST/PATCH/DELETE
+    return jsonify({
+        "username": session.get("username"),
+        "admin": session.get("admin") == 1,
+        "csrf_token": generate_csrf()
+    })
+
+@app.route("/api/v1/entries", methods = ["GET"])
+def api_list_entries():
+    date_for = request.args.get("date", datetime.today().date().isoformat())
+    if not is_valid_date(date_for):
+        return api_error("date must be YYYY-MM-DD", 400)
+    limit = request.args.get("limit", LEDGER_PAGE_SIZE, type=int)
+    if not 1 <= limit <= LEDGER_PAGE_MAX:
+        return api_error(f"limit must be between 1 and {LEDGER_PAGE_MAX}", 400)
+    after = request.args.get("after")
+
+    is_admin = session.get("admin") == 1
+    user_type = session.get("user_name", "").upper()
+    db = get_db()
+    try:
+        rows, next_cursor = ledger_cache.get_or_load(
+            db,
+            date_for,
+            f"{'admin' if is_admin else f'type={user_type}'}:page={after}:{limit}",
+            lambda: load_ledger_page(db, date_for, is_admin, user_type, after, limit)
+        )
+    except (BadSignature, ValueError):
+        return api_error("Invalid cursor", 400)
+    return jsonify({"date": date_for, "entries": [entry_json(r) for r in rows], "next": next_cursor})
+
+@app.route("/api/v1/export", methods = ["GET"])
+@limiter.limit("10 per minute")
+def api_export():
+    # Streams the entries of a date range as CSV or NDJSON, gzipped when the client accepts it
+    start = request.args.get("from", "")
+    end = request.args.get("to", start)
+    fmt = request.args.get("format", "csv")
+    if not is_valid_date(start) or not is_valid_date(end):
+        return api_error("from/to must be dates (YYYY-MM-DD)", 400)
+    start_date = datetime.strptime(start, "%Y-%m-%d").date()
+    end_date = datetime.strptime(end, "%Y-%m-%d").date()
+    if end_date < start_date:
+        return api_error("to must not be before from", 400)
+    if (end_date - start_date).days + 1 > EXPORT_RANGE_MAX_DAYS:
+        return api_error(f"Date range cannot exceed {EXPORT_RANGE_MAX_DAYS} days", 400)
+    if fmt not in EXPORT_MIMETYPES:
+        return api_error(f"format must be one of: {', '.join(EXPORT_MIMETYPES)}", 400)
+
+    is_admin = session.get("admin") == 1
+    user_type = session.get("user_name", "").upper()
+    sql, params = export_query(start_date, end_date, is_admin, user_type)
+    gzip = request.accept_encodings["gzip"] > 0
+    logger.info(f"Export {start_date} to {end_date} as {fmt} requested by {session.get('username')} from IP: {get_client_ip()}")
+
+    try:
+        chunks, close = open_export(sql, params, fmt, gzip)
+    except ExportBusy:
+        logger.warning(f"Export for {session.get('username')} turned away, too many exports in progress")
+        return api_error("Too many exports in progress, please try again shortly", 503)
+    except (PoolError, psycopg2.OperationalError):
+        logger.exception("Export could not get a database connection")
+        return api_error("Database unavailable, please try again shortly", 503)
+    except Exception:
+        logger.exception("Export query failed")
+        return api_error("Export failed", 500)
+
+    response = Response(chunks, mimetype=EXPORT_MIMETYPES[fmt])
+    response.call_on_close(close)
+    response.headers["Content-Disposition"] = f"attachment; filename=entries_{start_date.isoformat()}_{end_date.isoformat()}.{fmt}"
+    response.vary.add("Accept-Encoding")
+    if gzip:
+        response.headers["Content-Encoding"] = "gzip"
+    return response
+
+@app.route("/api/v1/entries", methods = ["POST"])
+def api_create_entries():
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return api_error("Expected a JSON object", 400)
+
+    db = get_db()
+    try:
+        created, dates = insert_entries(db, payload.get("input_type"), payload.get("type"), payload.get("subtype"), payload.get("table"), session["username"])
+        db.commit()
+    except ValidationError as e:
+        db.rollback()
+        return api_error(str(e), 400, errors=e.errors)
+    except (ValueError, TypeError, KeyError, AttributeError):
+        db.rollback()
+        return api_error("Invalid numeric or date value.", 400)
+    except Exception:
+        db.rollback()
+        logger.exception("API entry creation failed")
+        return api_error("Unexpected error occurred.", 500)
+
+    logger.info(f"{created} entries created through the API by {session.get('username')} from IP: {get_client_ip()}")
+    return jsonify({"created": created, "dates": dates}), 201
+
+@app.route("/api/v1/entries", methods = ["PATCH"])
+def api_update_entries():
+    if session.get("admin") != 1:
+        logger.warning(f"Unauthorized API update attempt by {session.get('username', 'unknown')} from IP: {get_client_ip()}")
+        return api_error("Unauthorized action", 403)
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get("entries"), list) or not all(isinstance(e, dict) for e in payload["entries"]):
+        return api_error("Expected {\"entries\": [{\"id\", \"amount\", \"receipts\"}, ...]}", 400)
+
+    db = get_db()
+    updates, errors = parse_row_updates(payload["entries"])
+    passed, failed = apply_row_updates(db, updates)
+    return jsonify({
+        "updated": passed,
+        "failed": failed + len(errors),
+        "errors": [{"id": row_id, "error": error} for row_id, error in errors]
+    }), 200 if passed or not (failed or errors) else 400
+
+@app.route("/api/v1/entries/<entry_id>", methods = ["DELETE"])
+def api_delete_entry(entry_id):
+    if session.get("admin") != 1:
+        logger.warning(f"Unauthorized API delete attempt by {session.get('username', 'unknown')} from IP: {get_client_ip()}")
+        return api_error("Unauthorized action", 403)
+
+    db = get_db()
+    try:
+        deleted = delete_entry(db, entry_id)
+        db.commit()
+    except ValueError:
+        db.rollback()
+        return api_error("Invalid id", 400)
+    except Exception:
+        db.rollback()
+        logger.exception("API row deletion failed")
+        return api_error("Deletion unsuccessful", 500)
+    if not deleted:
+        return api_error("Entry not found", 404)
+    return "", 204
+
+@app.errorhandler(CSRFError)
+def csrf_error(e):
+    if is_api_request():
+        return api_error(e.description, 400)
+    return e
+
+@app.route("/stats", methods = ["GET"])
+def stats():
+    if session.get("admin") != 1:
+        logger.warning(f"Unauthorized stats attempt by {session.get('username', 'unknown')} from IP: {get_client_ip()}")
+        return redirect(url_for("dataentry"))
+    return jsonify({
+        "db_pool": get_pool().stats(),
+        "ledger_cache": ledger_cache.stats(),
+        "report_cache": report_cache.stats(),
+        "logging": logging_stats(),
+        "session_versions": session_versions.stats(),
+        "password_hashing": passwordHashing.stats()
+    })
+
+@app.route("/metrics", methods = ["GET"], endpoint="metrics")
+def metrics_endpoint():
+    if session.get("admin") != 1:
+        logger.warning(f"Unauthorized metrics attempt by {session.get('username', 'unknown')} from IP: {get_client_ip()}")
+        return redirect(url_for("dataentry"))
+    return metrics.registry.render(), 200, {"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+
 @app.errorhandler(404)
 def not_found(e):
     if request.path == '/favicon.ico':
@@ -0,0 +1,230 @@
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
+from constants import LOG_DIRECTORY, LOG_QUEUE_SIZE, LOG_BATCH_SIZE
+
+# Request threads only copy the record onto a bounded queue; a single listener
+# thread formats it as JSON and writes it with the rest of its batch. When the
+# queue is full the record is dropped and counted instead of blocking.
+
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+_plain_formatter = logging.Formatter()
+# How long stop() waits for the listener to make room for its sentinel
+STOP_TIMEOUT = 5
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created)),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "pid": record.process,
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        if record.stack_info:
+            entry["stack"] = record.stack_info
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class DailyFileWriter:
+    def __init__(self, directory, formatter):
+        self.directory = directory
+        self.formatter = formatter
+        self.path = None
+        self._day = None
+        self._stream = None
+
+    def _open(self, day):
+        if self._stream is not None:
+            self._stream.close()
+        os.makedirs(self.directory, exist_ok=True)
+        self.path = os.path.join(self.directory, f"{day}-logs.log")
+        self._stream = open(self.path, "a", encoding="utf-8")
+        self._day = day
+
+    def write(self, records):
+        # The file is picked per record, so a batch spanning midnight is split
+        by_day = {}
+        for record in records:
+            day = time.strftime("%d-%m-%Y", time.localtime(record.created))
+            by_day.setdefault(day, []).append(self.formatter.format(record))
+        for day, lines in by_day.items():
+            if day != self._day:
+                self._open(day)
+            self._stream.write("\n".join(lines) + "\n")
+        self._stream.flush()
+
+    def close(self):
+        if self._stream is not None:
+            self._stream.close()
+            self._stream = None
+            self._day = None
+
+
+class BatchingQueueListener(QueueListener):
+    def __init__(self, log_queue, pipeline, batch_size):
+        super().__init__(log_queue)
+        self.pipeline = pipeline
+        self.batch_size = batch_size
+
+    def _monitor(self):
+        while True:
+            batch = [self.dequeue(True)]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.dequeue(False))
+                except queue.Empty:
+                    break
+            records = [r for r in batch if r is not self._sentinel]
+            if records:
+                self.pipeline.write(records)
+            if len(records) != len(batch):
+                return
+
+    def enqueue_sentinel(self):
+        # The base class uses put_nowait, which raises queue.Full at shutdown
+        # when the queue is full; wait for the listener to drain some of it,
+        # then drop the oldest records to make room rather than skip the drain
+        try:
+            self.queue.put(self._sentinel, timeout=STOP_TIMEOUT)
+            return
+        except queue.Full:
+            pass
+        while True:
+            try:
+                self.queue.put_nowait(self._sentinel)
+                return
+            except queue.Full:
+                pass
+            try:
+                self.queue.get_nowait()
+                self.pipeline.count("dropped")
+            except queue.Empty:
+                pass
+
+
+class PipelineHandler(QueueHandler):
+    def __init__(self, pipeline):
+        super().__init__(pipeline.queue)
+        self.pipeline = pipeline
+
+    def prepare(self, record):
+        # Only resolve what can't cross threads safely (args, tracebacks);
+        # JSON formatting happens on the listener thread
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _plain_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        self.pipeline.put(record)
+
+
+class LogPipeline:
+    def __init__(self, directory=LOG_DIRECTORY, queue_size=LOG_QUEUE_SIZE, batch_size=LOG_BATCH_SIZE):
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.writer = DailyFileWriter(directory, JsonFormatter())
+        # Other handlers (e.g. the stderr one basicConfig adds) also run on the listener thread
+        self.handlers = []
+        self._lock = threading.Lock()
+        self._stats = {"queued": 0, "dropped": 0, "written": 0, "batches": 0, "write_errors": 0}
+        self._start()
+
+    def _start(self):
+        self.queue = queue.Queue(self.queue_size)
+        self.listener = BatchingQueueListener(self.queue, self, self.batch_size)
+        self.listener.start()
+        self.pid = os.getpid()
+
+    def _restart_after_fork(self):
+        # The listener thread doesn't survive fork (gunicorn --preload, report
+        # job workers); give the child its own queue and thread
+        with self._lock:
+            if self.pid == os.getpid():
+                return
+            self._stats = dict.fromkeys(self._stats, 0)
+            self.writer.close()
+            self._start()
+
+    def put(self, record):
+        if self.pid != os.getpid():
+            self._restart_after_fork()
+        try:
+            self.queue.put_nowait(record)
+            name = "queued"
+        except queue.Full:
+            name = "dropped"
+        self.count(name)
+
+    def count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def write(self, records):
+        for handler in self.handlers:
+            for record in records:
+                if record.levelno >= handler.level:
+                    handler.handle(record)
+        try:
+            self.writer.write(records)
+            name, count = "written", len(records)
+        except Exception as e:
+            sys.stderr.write(f"Log write failed, dropped {len(records)} records: {e}\n")
+            self.writer.close()
+            name, count = "write_errors", len(records)
+        with self._lock:
+            self._stats[name] += count
+            self._stats["batches"] += 1
+
+    def stop(self):
+        if self.pid != os.getpid():
+            return
+        self.listener.stop()
+        self.writer.close()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["pending"] = self.queue.qsize()
+        stats["queue_size"] = self.queue_size
+        stats["file"] = self.writer.path
+        return stats
+
+
+_pipeline = None
+
+
+def setup_logging(level=logging.INFO):
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = LogPipeline()
+        logger = logging.getLogger()
+        logger.setLevel(level)
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            _pipeline.handlers.append(handler)
+        logger.addHandler(PipelineHandler(_pipeline))
+        atexit.register(_pipeline.stop)
+    return _pipeline
+
+
+def logging_stats():
+    return _pipeline.stats() if _pipeline is not None else None
@@ -0,0 +1,67 @@
+# Compares time and peak Python memory of generate_excel (in-memory workbook)
+# with generate_excel_streaming (write-only workbook) on synthetic data.
+# Usage: python benchmarks/bench_excel.py [rows ...]
+
+import pathlib
+import random
+import sys
+import time
+import tracemalloc
+from io import BytesIO
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from constants import COLUMN_MAP, INPUT_TYPE_SUBTYPES
+from excelOrchestration import generate_excel
+from excelStreaming import generate_excel_streaming, save_to_tempfile
+from util import trim_column_map
+
+
+def make_db_data(n):
+    random.seed(n)
+    data = {}
+    for i in range(n):
+        input_type = random.choice(list(INPUT_TYPE_SUBTYPES))
+        subtype = random.choice(INPUT_TYPE_SUBTYPES[input_type])
+        type_name = random.choice(list(COLUMN_MAP))
+        data.setdefault(type_name, {}).setdefault(input_type, {}).setdefault(subtype, []).append([random.randint(1, 99999), f"R-{i}"])
+    return data
+
+
+def in_memory(column_map, db_data):
+    output = BytesIO()
+    generate_excel(column_map, db_data).save(output)
+    return output.tell()
+
+
+def streaming(column_map, db_data):
+    output = save_to_tempfile(generate_excel_streaming(column_map, db_data))
+    output.seek(0, 2)
+    size = output.tell()
+    output.close()
+    return size
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    size = fn(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 10000, 50000]
+    column_map = trim_column_map(COLUMN_MAP, {"date"})
+    print(f"{'rows':>7} {'renderer':<10} {'seconds':>8} {'peak MiB':>9} {'file KiB':>9}")
+    for n in sizes:
+        db_data = make_db_data(n)
+        for name, fn in (("in-memory", in_memory), ("streaming", streaming)):
+            elapsed, peak, size = measure(fn, column_map, db_data)
+            print(f"{n:>7} {name:<10} {elapsed:>8.2f} {peak / 2**20:>9.1f} {size / 1024:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
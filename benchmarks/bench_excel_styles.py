@@ -0,0 +1,90 @@
+# Render and save time of the in-memory register (generate_excel), plus the
+# saved file size and the number of style records openpyxl had to collect,
+# against the previous per-cell styling: every font/alignment/border assigned
+# straight to the cell, a new Border per boxed cell, and each table outlined
+# by rebuilding the Border of every cell in its range. Both render the same plan.
+# Usage: python benchmarks/bench_excel_styles.py [rows ...]
+
+import pathlib
+import sys
+import time
+from io import BytesIO
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from openpyxl import Workbook
+from openpyxl.styles import Border
+
+from bench_excel import make_db_data
+from constants import COLUMN_MAP
+from excelHelpers import FONTS, ALIGNMENTS, THICK
+from excelLayout import plan_register, iter_register_rows, column_letter, BOX
+from excelOrchestration import generate_excel
+from util import trim_column_map
+
+
+def previous_draw_outer_border(ws, start_row, start_col, end_row, end_col):
+    for r in range(start_row, end_row + 1):
+        for c in range(start_col, end_col + 1):
+            cell = ws.cell(row=r, column=c)
+            cell.border = Border(
+                left=THICK if c == start_col else cell.border.left,
+                right=THICK if c == end_col else cell.border.right,
+                top=THICK if r == start_row else cell.border.top,
+                bottom=THICK if r == end_row else cell.border.bottom,
+            )
+
+
+def previous_generate_excel(column_map, db_data, report_date="01-01-2026"):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Expense Register"
+    plan = plan_register(column_map, db_data)
+    for col, width in plan.widths:
+        ws.column_dimensions[column_letter(col)].width = width
+    for r1, c1, r2, c2 in plan.merges:
+        ws.merge_cells(start_row=r1, start_column=c1, end_row=r2, end_column=c2)
+
+    for r, cells in iter_register_rows(plan, db_data, report_date):
+        for c, planned in cells.items():
+            cell = ws.cell(row=r, column=c)
+            if planned.value is not None:
+                cell.value = planned.value
+            if planned.font:
+                cell.font = FONTS[planned.font]
+            if planned.align:
+                cell.alignment = ALIGNMENTS[planned.align]
+            # Table body edges come from the outline pass below
+            if planned.border == BOX:
+                cell.border = Border(left=THICK, right=THICK, top=THICK, bottom=THICK)
+
+    for table in plan.tables:
+        previous_draw_outer_border(ws, table.start_row, table.start_col, table.end_row, table.end_col)
+    return wb
+
+
+def best_of(runs, fn):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [5000]
+    column_map = trim_column_map(COLUMN_MAP, {"date"})
+    print(f"{'rows':>7} {'path':>9} {'render s':>9} {'save s':>7} {'file KiB':>9} {'borders':>8} {'cell xfs':>9}")
+    for n in sizes:
+        db_data = make_db_data(n)
+        for name, fn in (("previous", previous_generate_excel), ("current", generate_excel)):
+            render, wb = best_of(3, lambda: fn(column_map, db_data))
+            output = BytesIO()
+            save, _ = best_of(3, lambda: (output.seek(0), output.truncate(), wb.save(output)))
+            print(f"{n:>7} {name:>9} {render:>9.3f} {save:>7.3f} {output.tell() / 1024:>9.0f} {len(wb._borders):>8} {len(wb._cell_styles):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# Range export for scripts: the streamed XLSX range report versus the CSV and
+# NDJSON row exports (plain and gzipped) over the same rows. Reports time,
+# Python peak memory (tracemalloc) and output size. Seeds rows inside a
+# transaction that is rolled back.
+# Usage: python benchmarks/bench_export.py [rows]
+
+import datetime
+import pathlib
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from constants import COLUMN_MAP
+from databaseManagement import DB
+from entryExport import EXPORT_COLUMNS, EXPORT_ORDER, export_chunks
+from excelReports import generate_excel_range
+from excelStreaming import save_to_tempfile
+from migrations import migrate
+from util import REPORT_COLUMNS, build_db_data_by_date, trim_column_map
+
+SEED_SQL = """INSERT INTO input (type, subtype, input_type, amount, receipts, date_for, submitted_by)
+    SELECT (ARRAY['METRO', 'OFFICE', 'TOUR'])[1 + g %% 3],
+           (ARRAY['CASH', 'PAYTM', 'HDFC BANK', 'OTHER BANK', 'CLAIMS', 'DISCOUNTS', 'BUDGET'])[1 + g %% 7],
+           CASE WHEN g %% 7 < 4 THEN 'EARNINGS' ELSE 'PAYMENTS' END,
+           1 + g %% 1000, 'R-' || g, DATE '2030-01-01' + (g %% 92), 'bench'
+    FROM generate_series(1, %(rows)s) g"""
+
+RANGE = (datetime.date(2030, 1, 1), datetime.date(2030, 4, 2))
+
+
+def xlsx(db):
+    rows = db.iter_tuples(f"SELECT {REPORT_COLUMNS}, date_for FROM input WHERE date_for BETWEEN %s AND %s", RANGE)
+    db_data, by_date, _ = build_db_data_by_date(rows)
+    wb = generate_excel_range(trim_column_map(COLUMN_MAP, {"date"}), db_data, by_date, *RANGE, False, True)
+    with save_to_tempfile(wb) as f:
+        return len(f.read())
+
+
+def rows_export(fmt, gzip):
+    def run(db):
+        rows = db.iter_tuples(f"SELECT {EXPORT_COLUMNS} FROM input WHERE date_for BETWEEN %s AND %s ORDER BY {EXPORT_ORDER}", RANGE)
+        return sum(len(chunk) for chunk in export_chunks(rows, fmt, gzip))
+    return run
+
+
+def measure(fn):
+    start = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak, size
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    paths = [
+        ("xlsx (streamed)", xlsx),
+        ("csv", rows_export("csv", False)),
+        ("csv gzip", rows_export("csv", True)),
+        ("ndjson", rows_export("ndjson", False)),
+        ("ndjson gzip", rows_export("ndjson", True)),
+    ]
+
+    db = DB()
+    try:
+        migrate(db)
+        db.execute(SEED_SQL, {"rows": n})
+        print(f"{n} rows over {RANGE[0]}..{RANGE[1]}")
+        print(f"{'path':<16} {'seconds':>8} {'peak MiB':>9} {'output KiB':>11}")
+        for name, fn in paths:
+            elapsed, peak, size = measure(lambda: fn(db))
+            print(f"{name:<16} {elapsed:>8.3f} {peak / 2 ** 20:>9.1f} {size / 1024:>11.0f}")
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
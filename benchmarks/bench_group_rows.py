@@ -0,0 +1,86 @@
+# Compares the previous dict-copying group_by_type_subtype with the single-pass
+# LedgerRow version on synthetic ledger rows (already ordered, as SQL returns them).
+# The previous path got datetimes from SELECT *; the current one gets the
+# to_char() strings LEDGER_COLUMNS now selects.
+# Usage: python benchmarks/bench_group_rows.py [rows ...]
+
+import os
+import pathlib
+import sys
+import time
+from datetime import date, datetime
+from decimal import Decimal
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+os.environ.setdefault("ID_TOKEN_KEYS", "benchmark-key")
+
+from idTokens import encode_id
+from util import group_by_type_subtype
+
+
+def previous_group_by_type_subtype(rows):
+    grouped = {}
+    for r in rows:
+        it = r.get("input_type", "UNKNOWN")
+        row = dict(r)
+        if isinstance(row.get("date_for"), str):
+            try:
+                row["date_for"] = datetime.strptime(row["date_for"], "%a, %d %b %Y %H:%M:%S GMT").strftime("%d %b %Y")
+            except ValueError:
+                pass
+        for key in ("created_at", "updated_at"):
+            if isinstance(row.get(key), datetime):
+                row[key] = row[key].strftime("%d %b %Y %H:%M")
+        row["id"] = encode_id(row["id"])
+        grouped.setdefault(it, {}).setdefault(r["type"], {}).setdefault(r["subtype"], []).append(row)
+
+    flat_rows = []
+    for input_type, types in grouped.items():
+        it_rowspan = sum(len(rows) for subtypes in types.values() for rows in subtypes.values())
+        first_it = True
+        for type_name, subtypes in types.items():
+            t_rowspan = sum(len(rows) for rows in subtypes.values())
+            first_t = True
+            for subtype_name, rows in subtypes.items():
+                st_rowspan = len(rows)
+                first_st = True
+                for row in rows:
+                    row["input_type_rowspan"] = it_rowspan if first_it else None
+                    row["type_rowspan"] = t_rowspan if first_t else None
+                    row["subtype_rowspan"] = st_rowspan if first_st else None
+                    flat_rows.append(row)
+                    first_it = first_t = first_st = False
+    return flat_rows
+
+
+def make_rows(n, sql_formatted=False):
+    now = "01 Jan 2026 10:30" if sql_formatted else datetime(2026, 1, 1, 10, 30)
+    keys = sorted((it, t, st) for it, subtypes in (("EARNINGS", ("CASH", "PAYTM", "HDFC BANK")), ("PAYMENTS", ("CLAIMS", "BUDGET"))) for t in ("METRO", "OFFICE", "TOUR") for st in subtypes)
+    rows = []
+    for i in range(n):
+        it, t, st = keys[i * len(keys) // n]
+        rows.append({
+            "id": i + 1, "input_type": it, "type": t, "subtype": st, "amount": Decimal("12.50"), "receipts": f"R-{i}",
+            "date_for": date(2026, 1, 1), "submitted_by": "bench", "created_at": now, "updated_at": now,
+        })
+    return rows
+
+
+def timed(fn, rows):
+    start = time.perf_counter()
+    fn(rows)
+    return time.perf_counter() - start
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [10000, 100000]
+    print(f"{'rows':>8} {'previous s':>11} {'current s':>10} {'speedup':>8}")
+    for n in sizes:
+        before = timed(previous_group_by_type_subtype, make_rows(n))
+        after = timed(group_by_type_subtype, make_rows(n, sql_formatted=True))
+        print(f"{n:>8} {before:>11.3f} {after:>10.3f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+# Compares the previous per-row Fernet id encryption with idTokens.
+# Usage: python benchmarks/bench_id_tokens.py [rows]
+
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from cryptography.fernet import Fernet
+from idTokens import IdTokenizer
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    ids = list(range(1, n + 1))
+
+    cipher = Fernet(Fernet.generate_key())
+    fernet_enc, tokens = timed(lambda: [cipher.encrypt(str(i).encode()).decode() for i in ids])
+    fernet_dec, _ = timed(lambda: [cipher.decrypt(t).decode() for t in tokens])
+
+    tokenizer = IdTokenizer([b"benchmark-key"])
+    hmac_enc, tokens = timed(lambda: tokenizer.encode_many(ids))
+    hmac_dec, _ = timed(lambda: tokenizer.decode_many(tokens))
+
+    print(f"{n} ids")
+    print(f"{'method':<8} {'encode/s':>12} {'decode/s':>12}")
+    print(f"{'fernet':<8} {n / fernet_enc:>12.0f} {n / fernet_dec:>12.0f}")
+    print(f"{'hmac':<8} {n / hmac_enc:>12.0f} {n / hmac_dec:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
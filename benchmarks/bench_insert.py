@@ -0,0 +1,60 @@
+# Compares the old per-row INSERT loop used by /dataentry with the two paths
+# DB.insert_rows picks between: multi-row INSERT (execute_many) below
+# DB_COPY_THRESHOLD rows and COPY at or above it.
+# Every run is rolled back, so it is safe against a development database.
+# Usage: python benchmarks/bench_insert.py [rows ...]
+
+import pathlib
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from databaseManagement import DB
+from constants import INPUT_INSERT_COLUMNS
+
+
+def make_rows(n):
+    today = date.today().isoformat()
+    return [("METRO", "CASH", 100 + i, f"R-{i}", today, "benchmark", "EARNINGS") for i in range(n)]
+
+
+def loop_insert(db, rows):
+    for row in rows:
+        db.execute("""INSERT INTO Input(type, subtype, amount, receipts, date_for, submitted_by, input_type) VALUES (%s, %s, %s, %s, %s, %s, %s)""", row)
+
+
+def batched_insert(db, rows):
+    # Called directly: insert_rows would switch to COPY for large batches
+    db.execute_many(f"INSERT INTO input ({', '.join(INPUT_INSERT_COLUMNS)}) VALUES %s", rows)
+
+
+def copy_insert(db, rows):
+    db.copy_rows("input", INPUT_INSERT_COLUMNS, rows)
+
+
+def timed(db, fn, rows):
+    start = time.perf_counter()
+    fn(db, rows)
+    elapsed = time.perf_counter() - start
+    db.rollback()
+    return elapsed
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [100, 300, 1000]
+    db = DB()
+    try:
+        print(f"{'rows':>6} {'method':<10} {'seconds':>9} {'rows/sec':>10}")
+        for n in sizes:
+            rows = make_rows(n)
+            for name, fn in (("loop", loop_insert), ("batched", batched_insert), ("copy", copy_insert)):
+                elapsed = timed(db, fn, rows)
+                print(f"{n:>6} {name:<10} {elapsed:>9.4f} {n / elapsed:>10.0f}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
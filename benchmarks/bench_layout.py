@@ -0,0 +1,61 @@
+# Register layout: time to plan a sheet (cold, and from the shape cache) and
+# to render the plan through each backend.
+# Usage: python benchmarks/bench_layout.py [rows ...]
+
+import io
+import pathlib
+import sys
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from bench_excel import make_db_data
+from constants import COLUMN_MAP
+from excelLayout import _plan, plan_register
+from excelOrchestration import generate_excel
+from excelStreaming import generate_excel_streaming, save_to_tempfile
+from registerText import write_register_csv, write_register_html
+from util import trim_column_map
+
+
+def best_of(runs, fn):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def plan_cold(column_map, db_data):
+    _plan.cache_clear()
+    plan_register(column_map, db_data)
+
+
+def xlsx_streaming(column_map, db_data):
+    save_to_tempfile(generate_excel_streaming(column_map, db_data)).close()
+
+
+BACKENDS = [
+    ("plan (cold)", plan_cold),
+    ("plan (cached)", plan_register),
+    ("openpyxl", generate_excel),
+    ("streaming xlsx", xlsx_streaming),
+    ("csv", lambda cm, d: write_register_csv(io.StringIO(), cm, d)),
+    ("html", lambda cm, d: write_register_html(io.StringIO(), cm, d)),
+]
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [5000]
+    column_map = trim_column_map(COLUMN_MAP, {"date"})
+    for n in sizes:
+        db_data = make_db_data(n)
+        print(f"{n} rows")
+        for name, fn in BACKENDS:
+            print(f"  {name:<15} {best_of(3, lambda: fn(column_map, db_data)) * 1000:>9.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+# Login throughput under concurrency: inline bcrypt.checkpw (the old login
+# path) versus passwordHashing.check_password with its bounded pool.
+# Usage: python benchmarks/bench_password_hashing.py [concurrent_logins] [rounds]
+# Pool size and queue limit come from PASSWORD_HASH_WORKERS / PASSWORD_HASH_MAX_PENDING.
+
+import pathlib
+import sys
+import threading
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+import bcrypt
+import passwordHashing
+from passwordHashing import check_password, PasswordHasherBusy
+
+
+def run(n, login):
+    results = {"ok": 0, "busy": 0, "latencies": []}
+    lock = threading.Lock()
+    barrier = threading.Barrier(n)
+
+    def worker():
+        barrier.wait()
+        start = time.perf_counter()
+        try:
+            login()
+            outcome = "ok"
+        except PasswordHasherBusy:
+            outcome = "busy"
+        elapsed = time.perf_counter() - start
+        with lock:
+            results[outcome] += 1
+            if outcome == "ok":
+                results["latencies"].append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(n)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results["wall"] = time.perf_counter() - start
+    return results
+
+
+def report(name, results):
+    latencies = sorted(results["latencies"]) or [0.0]
+    p50 = latencies[len(latencies) // 2]
+    print(f"{name:<8} {results['ok']:>6} {results['busy']:>6} {results['ok'] / results['wall']:>10.1f} {p50 * 1000:>9.0f} {latencies[-1] * 1000:>9.0f}")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    hashed = bcrypt.hashpw(b"password1", bcrypt.gensalt(rounds)).decode()
+
+    print(f"{n} concurrent logins, bcrypt cost {rounds}, pool: {passwordHashing.stats()['workers']} workers, {passwordHashing.stats()['max_pending']} max pending")
+    print(f"{'path':<8} {'ok':>6} {'busy':>6} {'logins/s':>10} {'p50 ms':>9} {'max ms':>9}")
+    report("inline", run(n, lambda: bcrypt.checkpw(b"password1", hashed.encode())))
+    report("pool", run(n, lambda: check_password("password1", hashed)))
+
+
+if __name__ == "__main__":
+    main()
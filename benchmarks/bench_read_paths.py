@@ -0,0 +1,77 @@
+# Memory and time of the range-export read: SELECT * through RealDictCursor
+# (the previous path) versus select_tuples() and the server-side iter_tuples()
+# with explicit REPORT_COLUMNS. Seeds rows inside a transaction that is rolled back.
+# Peak memory is from tracemalloc, so it covers Python objects but not libpq's
+# own result buffer (which the server-side cursor also keeps small).
+# Usage: python benchmarks/bench_read_paths.py [rows]
+
+import pathlib
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from databaseManagement import DB
+from migrations import migrate
+from util import REPORT_COLUMNS, build_db_data_by_date
+
+SEED_SQL = """INSERT INTO input (type, subtype, input_type, amount, receipts, date_for, submitted_by)
+    SELECT (ARRAY['METRO', 'OFFICE', 'TOUR'])[1 + g %% 3],
+           (ARRAY['CASH', 'PAYTM', 'HDFC BANK', 'OTHER BANK', 'CLAIMS', 'DISCOUNTS', 'BUDGET'])[1 + g %% 7],
+           CASE WHEN g %% 7 < 4 THEN 'EARNINGS' ELSE 'PAYMENTS' END,
+           1 + g %% 1000, 'R-' || g, DATE '2030-01-01' + (g %% 92), 'bench'
+    FROM generate_series(1, %(rows)s) g"""
+
+RANGE = ("2030-01-01", "2030-04-02")
+
+
+def previous_build_db_data_by_date(rows):
+    data = {}
+    by_date = {}
+    for r in rows:
+        entry = [r["amount"], r["receipts"]]
+        data.setdefault(r["type"], {}).setdefault(r.get("input_type", "UNKNOWN"), {}).setdefault(r["subtype"], []).append(entry)
+        by_date.setdefault(r["date_for"], {}).setdefault(r["type"], {}).setdefault(r.get("input_type", "UNKNOWN"), {}).setdefault(r["subtype"], []).append(entry)
+    return data, by_date
+
+
+def measure(fn):
+    # Timed without tracemalloc, which slows allocation-heavy code several times over
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    sql = f"SELECT {REPORT_COLUMNS}, date_for FROM input WHERE date_for BETWEEN %s AND %s"
+    paths = [
+        ("dict rows", lambda db: previous_build_db_data_by_date(db.select("SELECT * FROM input WHERE date_for BETWEEN %s AND %s", RANGE))),
+        ("tuples", lambda db: build_db_data_by_date(db.select_tuples(sql, RANGE))),
+        ("streamed", lambda db: build_db_data_by_date(db.iter_tuples(sql, RANGE))),
+        ("dict fetch only", lambda db: db.select("SELECT * FROM input WHERE date_for BETWEEN %s AND %s", RANGE)),
+        ("tuple fetch only", lambda db: db.select_tuples(sql, RANGE)),
+    ]
+
+    db = DB()
+    try:
+        migrate(db)
+        db.execute(SEED_SQL, {"rows": n})
+        print(f"{n} rows over {RANGE[0]}..{RANGE[1]}")
+        print(f"{'path':<18} {'seconds':>8} {'peak MiB':>9}")
+        for name, fn in paths:
+            elapsed, peak = measure(lambda: fn(db))
+            print(f"{name:<18} {elapsed:>8.3f} {peak / 2 ** 20:>9.1f}")
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+# Day register download cost without and with the artifact cache: render and
+# save the workbook, versus open and read the file stored for the same key.
+# Usage: python benchmarks/bench_report_cache.py [rows ...]
+
+import pathlib
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from bench_excel import make_db_data
+from constants import COLUMN_MAP
+from excelOrchestration import generate_excel
+from reportCache import ReportCache, artifact_key
+from util import trim_column_map
+
+
+def best_of(runs, fn):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 5000]
+    column_map = trim_column_map(COLUMN_MAP, {"date"})
+    print(f"{'rows':>7} {'render+save ms':>15} {'cached ms':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = ReportCache(tmpdir, 1 << 30)
+        for n in sizes:
+            db_data = make_db_data(n)
+            key = artifact_key("2026-01-01", "admin", column_map, n)
+
+            def render():
+                cache.store("2026-01-01", key, generate_excel(column_map, db_data).save).close()
+
+            def serve():
+                with cache.open("2026-01-01", key) as f:
+                    f.read()
+
+            cold = best_of(3, render)
+            warm = best_of(20, serve)
+            print(f"{n:>7} {cold * 1000:>15.1f} {warm * 1000:>10.2f} {cold / warm:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+# Per-request overhead of the shared-state backends: the rate-limit
+# increment and lookup Flask-Limiter makes on /login.
+# Usage: python benchmarks/bench_shared_state.py [iterations] [backend ...]
+# (postgres needs the app's database settings and migrations applied)
+
+import os
+import pathlib
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from sharedState import MemoryBackend, SqliteBackend, PostgresBackend
+
+
+def per_call_us(fn, n):
+    start = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    names = sys.argv[2:] or ["memory", "sqlite", "postgres"]
+    tmpdir = tempfile.mkdtemp()
+    factories = {
+        "memory": MemoryBackend,
+        "sqlite": lambda: SqliteBackend(os.path.join(tmpdir, "bench.sqlite3")),
+        "postgres": PostgresBackend,
+    }
+
+    print(f"{n} calls, microseconds per call")
+    print(f"{'backend':<10} {'limit incr':>12} {'limit get':>12}")
+    for name in names:
+        try:
+            backend = factories[name]()
+            incr = per_call_us(lambda i: backend.incr(f"bench/{i % 50}", 60), n)
+            get = per_call_us(lambda i: backend.get(f"bench/{i % 50}"), n)
+            backend.reset()
+        except Exception as e:
+            print(f"{name:<10} skipped: {e}")
+            continue
+        print(f"{name:<10} {incr:>12.1f} {get:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# Cold-start regression check: imports app in fresh interpreters with
+# python -X importtime, reports the median import time and the slowest
+# top-level imports, and exits non-zero if a lazily loaded module (openpyxl)
+# was imported at startup or, with --budget-ms, if the median exceeds the budget.
+# Usage: python benchmarks/bench_startup.py [runs] [--budget-ms N]
+
+import os
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+
+LAZY_MODULES = ["openpyxl", "excelOrchestration", "excelStreaming", "excelReports"]
+
+
+def import_times(tmpdir):
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": str(ROOT),
+        "LOG_DIRECTORY": os.path.join(tmpdir, "logs"),
+        "SHARED_STATE_PATH": os.path.join(tmpdir, "shared_state.sqlite3"),
+        "REPORT_JOBS_DIR": os.path.join(tmpdir, "report_jobs"),
+    })
+    env.pop("REPORTS_PRELOAD", None)
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app"], cwd=tmpdir, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"import app failed:\n{result.stderr[-2000:]}")
+
+    # "import time: self [us] | cumulative | imported package", nesting shown by indentation
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        times.setdefault(name.strip(), (int(cumulative), depth))
+    return times
+
+
+def main():
+    args = sys.argv[1:]
+    budget_ms = None
+    if "--budget-ms" in args:
+        i = args.index("--budget-ms")
+        budget_ms = float(args[i + 1])
+        del args[i:i + 2]
+    runs = int(args[0]) if args else 5
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        samples = [import_times(tmpdir) for _ in range(runs)]
+
+    totals = [s["app"][0] / 1000 for s in samples]
+    median = statistics.median(totals)
+    print(f"import app over {runs} runs: median {median:.0f} ms, min {min(totals):.0f} ms, max {max(totals):.0f} ms")
+
+    last = samples[-1]
+    top_level = sorted(((t, name) for name, (t, depth) in last.items() if depth == 1), reverse=True)[:10]
+    print("slowest imports made by app (cumulative ms, last run):")
+    for t, name in top_level:
+        print(f"  {t / 1000:>7.1f}  {name}")
+
+    failures = [f"{name} is imported at startup" for name in LAZY_MODULES if name in last]
+    if budget_ms is not None and median > budget_ms:
+        failures.append(f"median import time {median:.0f} ms exceeds the {budget_ms:.0f} ms budget")
+    if failures:
+        print("\n" + "\n".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+# Validation throughput for /dataentry tables: the previous validate_table_data
+# plus the index building insert_entries repeated, versus validate_table with
+# the precompiled plan. Times a valid batch; also reports how many errors
+# each version reports for a batch where every row is bad.
+# Usage: python benchmarks/bench_validation.py [rows ...]
+
+import pathlib
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent))
+
+from constants import COLUMN_MAP
+from util import sanitise_input
+from validators import ValidationError, get_plan, validate_table
+
+
+def previous_validate_table_data(table_data, allowed_columns):
+    headings = table_data["headings"]
+    rows = table_data["data"]
+    received_cols = [h["name"].lower() for h in headings]
+    allowed_cols = [c["name"].lower() for c in allowed_columns]
+    if received_cols != allowed_cols:
+        raise ValidationError("Column mismatch detected")
+    col_index = {sanitise_input(name): idx for idx, name in enumerate(received_cols)}
+    for row_num, row in enumerate(rows, start=1):
+        if not isinstance(row, list):
+            raise ValidationError(f"Row {row_num} is invalid")
+        if len(row) != len(received_cols):
+            raise ValidationError(f"Row {row_num} has invalid column count")
+        try:
+            amount = Decimal(row[col_index["amount"]])
+            if amount <= 0:
+                raise ValidationError
+        except (InvalidOperation, ValidationError):
+            raise ValidationError(f"Row {row_num}: Amount must be > 0")
+        try:
+            datetime.strptime(row[col_index["date"]], "%Y-%m-%d")
+        except Exception:
+            raise ValidationError(f"Row {row_num}: Invalid date")
+        receipt = row[col_index["receipts"]]
+        if not isinstance(receipt, str):
+            raise ValidationError(f"Row {row_num}: Receipts must be text")
+        if len(receipt) > 100:
+            raise ValidationError(f"Row {row_num}: Receipts too long")
+        import re
+        if not re.match(r'^[A-Za-z0-9\s\-\.\,\(\)\/\\&@]+$', receipt):
+            raise ValidationError(f"Row {row_num}: Receipts contains invalid characters")
+    return True
+
+
+def previous_path(table_data):
+    allowed_columns = COLUMN_MAP["METRO"]["CASH"]
+    previous_validate_table_data(table_data, allowed_columns)
+    columns = [c["name"].lower() for c in allowed_columns]
+    idx = {sanitise_input(name): i for i, name in enumerate(columns)}
+    return [(row[idx["amount"]], row[idx["receipts"]], row[idx["date"]]) for row in table_data["data"]]
+
+
+def current_path(table_data):
+    return validate_table(table_data, get_plan("METRO", "CASH"))
+
+
+def make_table(n, valid=True):
+    headings = [{"name": c["name"]} for c in COLUMN_MAP["METRO"]["CASH"]]
+    if valid:
+        data = [[str(100 + i), f"R-{i} (cash)", "2026-01-15"] for i in range(n)]
+    else:
+        data = [["-1", "bad<receipt>", "2026-13-40"] for _ in range(n)]
+    return {"headings": headings, "data": data}
+
+
+def errors_reported(fn, table_data):
+    try:
+        fn(table_data)
+    except ValidationError as e:
+        return str(e)
+    return "no errors"
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [1000, 10000, 100000]
+    print(f"{'rows':>8} {'previous rows/s':>16} {'current rows/s':>15} {'speedup':>8}")
+    for n in sizes:
+        table = make_table(n)
+        assert previous_path(table) == current_path(table)
+        timings = []
+        for fn in (previous_path, current_path):
+            best = None
+            for _ in range(3):
+                start = time.perf_counter()
+                fn(table)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings.append(best)
+        print(f"{n:>8} {n / timings[0]:>16,.0f} {n / timings[1]:>15,.0f} {timings[0] / timings[1]:>7.1f}x")
+
+    bad = make_table(100, valid=False)
+    print(f"\nall-invalid batch of 100 rows: previous {errors_reported(previous_path, bad)!r}, current {errors_reported(current_path, bad)!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# Query plan regression check: applies migrations, seeds a large dataset
+# inside a transaction, runs EXPLAIN for every hot query the app issues and
+# exits non-zero if any of them plans a sequential scan on an app table.
+# The seed data is rolled back; only the (idempotent) migrations persist.
+# Usage: python benchmarks/check_query_plans.py [input_rows]
+
+import os
+import pathlib
+import sys
+import tempfile
+
+ROOT = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+# The queries are imported from the modules that issue them, so this check
+# cannot drift from the app; keep importing app from writing into the tree
+_scratch = tempfile.mkdtemp(prefix="check_query_plans_")
+os.environ.setdefault("LOG_DIRECTORY", os.path.join(_scratch, "logs"))
+os.environ.setdefault("SHARED_STATE_PATH", os.path.join(_scratch, "shared_state.sqlite3"))
+os.environ.setdefault("REPORT_JOBS_DIR", os.path.join(_scratch, "report_jobs"))
+
+import app
+from dailyTotals import DELETE_SQL as DELETE_TOTALS_SQL, REFRESH_SQL, totals_query
+from databaseManagement import DB
+from ledgerCache import VERSION_SQL, BUMP_VERSIONS_FOR_IDS_SQL
+from migrations import migrate
+from sessionVersions import SESSION_STATE_SQL
+
+CHECKED_TABLES = {"input", "nisusers", "input_versions", "input_daily_totals"}
+
+DAY = "2025-06-01"
+MONTH = ("2025-06-01", "2025-06-30")
+LEDGER_KEY = ("EARNINGS", "METRO", "CASH", 5)
+
+QUERIES = [
+    ("login", app.ACTIVE_USER_SQL, ("seed42",)),
+    ("session version", SESSION_STATE_SQL, ("seed42",)),
+    ("manageuser exists", app.ANY_USER_SQL, ("seed42",)),
+    ("rehash password", app.REHASH_PASSWORD_SQL, ("x", "seed42", "x")),
+    ("delete_user", app.DEACTIVATE_USER_SQL, ("seed42",)),
+    ("edit_user", app.EDIT_USER_SQL, ("n", "user", "seed42")),
+    ("edit_user password", app.EDIT_USER_PASSWORD_SQL, ("n", "user", "x", "seed42")),
+    ("ledger admin", *app.ledger_page_query(DAY, True, "")),
+    ("ledger user", *app.ledger_page_query(DAY, False, "METRO")),
+    ("ledger page admin", *app.ledger_page_query(DAY, True, "", LEDGER_KEY)),
+    ("ledger page user", *app.ledger_page_query(DAY, False, "METRO", LEDGER_KEY)),
+    ("register admin", *app.day_report_query(DAY, True, "")),
+    ("register user", *app.day_report_query(DAY, False, "METRO")),
+    ("range admin", *app.range_report_query(*MONTH, True, "")),
+    ("range user", *app.range_report_query(*MONTH, False, "METRO")),
+    ("export admin", *app.export_query(*MONTH, True, "")),
+    ("export user", *app.export_query(*MONTH, False, "METRO")),
+    ("ledger version", VERSION_SQL, (DAY,)),
+    ("bump versions for ids", BUMP_VERSIONS_FOR_IDS_SQL, ([1, 2, 3],)),
+    ("update row", app.UPDATE_ENTRY_SQL, (1, "x", 5)),
+    ("bulk update rows", app.BULK_UPDATE_SQL.replace("%s", "(1, 1.0, 'a'), (2, 2.0, 'b')"), None),
+    ("delete row", app.DELETE_ENTRY_SQL, (5,)),
+    ("refresh totals delete", DELETE_TOTALS_SQL, ([DAY],)),
+    ("refresh totals insert", REFRESH_SQL, ([DAY],)),
+    ("totals admin", *totals_query(*MONTH)),
+    ("totals user", *totals_query(*MONTH, "METRO")),
+]
+
+SEED_SQL = [
+    """INSERT INTO input (type, subtype, input_type, amount, receipts, date_for, submitted_by)
+    SELECT (ARRAY['METRO', 'OFFICE', 'TOUR'])[1 + g %% 3],
+           (ARRAY['CASH', 'PAYTM', 'HDFC BANK', 'OTHER BANK', 'CLAIMS', 'DISCOUNTS', 'BUDGET'])[1 + g %% 7],
+           CASE WHEN g %% 7 < 4 THEN 'EARNINGS' ELSE 'PAYMENTS' END,
+           1 + g %% 1000, 'R-' || g, DATE '2023-01-01' + (g %% 1095), 'seed'
+    FROM generate_series(1, %(rows)s) g""",
+    """INSERT INTO NisUsers (Username, Name, Password, role, is_active)
+    SELECT 'seed' || g, 'Seed User', 'x', 'user', g %% 10 <> 0 FROM generate_series(1, 5000) g
+    ON CONFLICT DO NOTHING""",
+    """INSERT INTO input_versions (date_for, version)
+    SELECT DATE '2023-01-01' + g, 1 FROM generate_series(0, 1094) g
+    ON CONFLICT DO NOTHING""",
+    """INSERT INTO input_daily_totals (date_for, type, input_type, subtype, total, row_count)
+    SELECT date_for, type, COALESCE(input_type, 'UNKNOWN'), subtype, SUM(amount), COUNT(*)
+    FROM input GROUP BY date_for, type, COALESCE(input_type, 'UNKNOWN'), subtype
+    ON CONFLICT DO NOTHING""",
+]
+
+ANALYZE_SQL = ["ANALYZE input", "ANALYZE NisUsers", "ANALYZE input_versions", "ANALYZE input_daily_totals"]
+
+
+def walk(plan):
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from walk(child)
+
+
+def explain(db, sql, params):
+    result = db.select("EXPLAIN (FORMAT JSON) " + sql, params)
+    return result[0]["QUERY PLAN"][0]["Plan"]
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 300000
+    db = DB()
+    failures = []
+    try:
+        migrate(db)
+        for statement in SEED_SQL:
+            db.execute(statement, {"rows": rows})
+        for statement in ANALYZE_SQL:
+            db.execute(statement)
+
+        for name, sql, params in QUERIES:
+            nodes = list(walk(explain(db, sql, params)))
+            seq_scans = sorted({n.get("Relation Name") for n in nodes if n["Node Type"] == "Seq Scan" and n.get("Relation Name") in CHECKED_TABLES})
+            scans = ", ".join(f"{n['Node Type']} on {n['Relation Name']}" for n in nodes if n.get("Relation Name"))
+            status = "FAIL" if seq_scans else "ok"
+            print(f"{status:<5} {name:<24} {scans}")
+            if seq_scans:
+                failures.append((name, seq_scans))
+    finally:
+        db.rollback()
+        db.close()
+
+    if failures:
+        print(f"\n{len(failures)} quer{'y' if len(failures) == 1 else 'ies'} fell back to a sequential scan:")
+        for name, tables in failures:
+            print(f"  {name}: {', '.join(tables)}")
+        sys.exit(1)
+    print(f"\nAll {len(QUERIES)} queries use index access paths ({rows} seeded input rows)")
+
+
+if __name__ == "__main__":
+    main()
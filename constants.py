@@ -16,6 +16,28 @@ DATABASE_NAME = os.environ.get('DATABASE_NAME')
 DB_HOST = os.environ.get('DB_HOST', 'localhost')
 DB_PORT = int(os.environ.get('DB_PORT', 5432))
 
+DB_POOL_MIN_SIZE = int(os.environ.get('DB_POOL_MIN_SIZE', 1))
+DB_POOL_MAX_SIZE = int(os.environ.get('DB_POOL_MAX_SIZE', 10))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10))
+DB_POOL_HEALTHCHECK_AFTER = float(os.environ.get('DB_POOL_HEALTHCHECK_AFTER', 30))
+DB_BATCH_PAGE_SIZE = int(os.environ.get('DB_BATCH_PAGE_SIZE', 500))
+DB_COPY_THRESHOLD = int(os.environ.get('DB_COPY_THRESHOLD', 1000))
+DB_ITERSIZE = int(os.environ.get('DB_ITERSIZE', 2000))
+
+LEDGER_CACHE_SIZE = int(os.environ.get('LEDGER_CACHE_SIZE', 64))
+LEDGER_CACHE_SHARED = os.environ.get('LEDGER_CACHE_SHARED', '')
+# Rows per page of the ledger table and /api/v1/entries (which accepts up to LEDGER_PAGE_MAX)
+LEDGER_PAGE_SIZE = int(os.environ.get('LEDGER_PAGE_SIZE', 500))
+LEDGER_PAGE_MAX = int(os.environ.get('LEDGER_PAGE_MAX', 2000))
+
+# Reports with at least this many rows use the write-only (streaming) renderer
+EXCEL_STREAMING_MIN_ROWS = int(os.environ.get('EXCEL_STREAMING_MIN_ROWS', 2000))
+EXCEL_RANGE_MAX_DAYS = int(os.environ.get('EXCEL_RANGE_MAX_DAYS', 92))
+# Longest date range /api/v1/export streams in one request
+EXPORT_RANGE_MAX_DAYS = int(os.environ.get('EXPORT_RANGE_MAX_DAYS', 366))
+# Exports streaming at once per worker; each holds a pool connection until its client has read it all
+EXPORT_MAX_CONCURRENT = int(os.environ.get('EXPORT_MAX_CONCURRENT', 2))
+
 FLASK_SECRET_KEY = os.environ.get('FLASK_SECRET_KEY')
 ADMIN_DEFAULT_PASSWORD = os.environ.get('ADMIN_DEFAULT_PASSWORD')
 ID_FERNET_KEY = os.environ.get('ID_FERNET_KEY')
@@ -31,9 +53,49 @@ if _missing and not DATABASE_URL:
 if isinstance(ID_FERNET_KEY, str):
     ID_FERNET_KEY = ID_FERNET_KEY.encode()
 
+# Comma separated; the first key signs row id tokens, the rest are accepted during rotation
+ID_TOKEN_KEYS = [k.strip().encode() for k in os.environ.get('ID_TOKEN_KEYS', '').split(',') if k.strip()] or [k for k in [ID_FERNET_KEY] if k]
+
 CURRENT_WORKING_DIRECTORY = pathlib.Path(__file__).parent.resolve()
 SAFE_HEADERS = ["User-Agent", "Accept", "Referer"]
-ADMIN_ENDPOINTS = ["manageuser", "delete_user", "edit_user", "submittable", "deleterow"]
+REPORT_JOBS_DIR = os.environ.get('REPORT_JOBS_DIR', os.path.join(CURRENT_WORKING_DIRECTORY, 'report_jobs'))
+REPORT_JOB_TTL = int(os.environ.get('REPORT_JOB_TTL', 3600))
+REPORT_JOB_WORKERS = int(os.environ.get('REPORT_JOB_WORKERS', 2))
+REPORT_JOB_EXECUTOR = os.environ.get('REPORT_JOB_EXECUTOR', 'process')
+# Reports with at least this many rows are rendered in the background instead of inline
+REPORT_ASYNC_MIN_ROWS = int(os.environ.get('REPORT_ASYNC_MIN_ROWS', 20000))
+# openpyxl is loaded on the first export unless this is set; set it when running
+# gunicorn with --preload so the master imports it once and workers share it
+REPORTS_PRELOAD = os.environ.get('REPORTS_PRELOAD', '').lower() in ('1', 'true', 'yes')
+# Rendered day registers are kept on disk up to this many bytes in total; 0 disables the cache
+REPORT_CACHE_DIR = os.environ.get('REPORT_CACHE_DIR', os.path.join(CURRENT_WORKING_DIRECTORY, 'report_cache'))
+REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+
+LOG_DIRECTORY = os.environ.get('LOG_DIRECTORY', os.path.join(CURRENT_WORKING_DIRECTORY, 'logs'))
+# Records beyond this many waiting to be written are dropped (and counted)
+LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+LOG_BATCH_SIZE = int(os.environ.get('LOG_BATCH_SIZE', 256))
+# Distinct statements tracked by /metrics before the rest are folded into "other"
+METRICS_MAX_QUERY_FINGERPRINTS = int(os.environ.get('METRICS_MAX_QUERY_FINGERPRINTS', 200))
+
+# Rate limits shared between workers: sqlite (one host), postgres (several hosts) or memory (dev only)
+SHARED_STATE_BACKEND = os.environ.get('SHARED_STATE_BACKEND', 'sqlite')
+SHARED_STATE_PATH = os.environ.get('SHARED_STATE_PATH', os.path.join(CURRENT_WORKING_DIRECTORY, 'shared_state.sqlite3'))
+
+# How long a worker trusts its cached copy of a user's session_version
+SESSION_VERSION_TTL = float(os.environ.get('SESSION_VERSION_TTL', 5))
+SESSION_VERSION_CACHE_SIZE = int(os.environ.get('SESSION_VERSION_CACHE_SIZE', 1024))
+
+# bcrypt cost for new hashes; existing hashes are upgraded on the next login
+PASSWORD_BCRYPT_ROUNDS = int(os.environ.get('PASSWORD_BCRYPT_ROUNDS', 12))
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', max(1, min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_EXECUTOR = os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread')
+# Running + queued password operations across all workers of a host (one
+# SHARED_STATE_BACKEND) before logins get a "try again"
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING', 8))
+PASSWORD_HASH_TIMEOUT = float(os.environ.get('PASSWORD_HASH_TIMEOUT', 5))
+
+ADMIN_ENDPOINTS = ["manageuser", "delete_user", "edit_user", "submittable", "deleterow", "stats", "metrics"]
 
 COLUMN_MAP = {
     "METRO": {
@@ -163,3 +225,4 @@ DISPLAY_COLUMNS = [
     ("updated_at", "Last Update Date")
 ]
 
+INPUT_INSERT_COLUMNS = ("type", "subtype", "amount", "receipts", "date_for", "submitted_by", "input_type")
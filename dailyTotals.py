@@ -0,0 +1,54 @@
+# input_daily_totals (see migrations.py) holds SUM(amount)/COUNT(*) per
+# (date_for, type, input_type, subtype). The write paths refresh the dates
+# they touched in the same transaction, after bump_versions has locked those
+# dates' version rows, so concurrent writers to one date apply in turn.
+
+DELETE_SQL = "DELETE FROM input_daily_totals WHERE date_for = ANY(%s::date[])"
+REFRESH_SQL = """
+INSERT INTO input_daily_totals (date_for, type, input_type, subtype, total, row_count)
+SELECT date_for, type, COALESCE(input_type, 'UNKNOWN'), subtype, SUM(amount), COUNT(*)
+FROM input
+WHERE date_for = ANY(%s::date[])
+GROUP BY date_for, type, COALESCE(input_type, 'UNKNOWN'), subtype
+"""
+
+
+def refresh_daily_totals(db, dates):
+    dates = sorted(set(dates))
+    if not dates:
+        return
+    db.execute(DELETE_SQL, (dates,))
+    db.execute(REFRESH_SQL, (dates,))
+
+
+def totals_query(start_date, end_date, type_filter=None):
+    sql = "SELECT date_for, type, input_type, subtype, total, row_count FROM input_daily_totals WHERE date_for BETWEEN %s AND %s"
+    params = [start_date, end_date]
+    if type_filter is not None:
+        sql += " AND UPPER(type) = %s"
+        params.append(type_filter)
+    return sql + " ORDER BY date_for, input_type, type, subtype", tuple(params)
+
+
+def get_totals(db, start_date, end_date, type_filter=None):
+    rows = db.select_tuples(*totals_query(start_date, end_date, type_filter), named=True)
+
+    groups = {}
+    input_types = {}
+    days = {}
+    for r in rows:
+        key = (r.input_type, r.type, r.subtype)
+        group = groups.setdefault(key, {"input_type": key[0], "type": key[1], "subtype": key[2], "total": 0, "count": 0})
+        group["total"] += r.total
+        group["count"] += r.row_count
+
+        input_types[r.input_type] = input_types.get(r.input_type, 0) + r.total
+
+        day = days.setdefault(r.date_for.isoformat(), {})
+        day[r.input_type] = day.get(r.input_type, 0) + r.total
+
+    return {
+        "groups": [{**g, "total": float(g["total"])} for g in groups.values()],
+        "input_type_totals": {k: float(v) for k, v in input_types.items()},
+        "daily": {d: {k: float(v) for k, v in totals.items()} for d, totals in days.items()},
+    }
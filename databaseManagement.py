@@ -1,36 +1,306 @@
+import io
+import itertools
 import logging
+import os
+import threading
+import time
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
-from constants import DATABASE_URL, DATABASE_NAME, DB_USERNAME, DB_PASSWORD, DB_HOST, DB_PORT
+from psycopg2 import sql as pgsql
+from psycopg2.pool import PoolError
+from metrics import record_query
+from constants import DATABASE_URL, DATABASE_NAME, DB_USERNAME, DB_PASSWORD, DB_HOST, DB_PORT, DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT, DB_POOL_HEALTHCHECK_AFTER, DB_BATCH_PAGE_SIZE, DB_COPY_THRESHOLD, DB_ITERSIZE
+
+
+def _connect():
+    if DATABASE_URL:
+        conn = psycopg2.connect(DATABASE_URL, cursor_factory=psycopg2.extras.RealDictCursor)
+    else:
+        conn = psycopg2.connect(
+            user=DB_USERNAME,
+            password=DB_PASSWORD,
+            database=DATABASE_NAME,
+            host=DB_HOST,
+            port=DB_PORT,
+            cursor_factory=psycopg2.extras.RealDictCursor
+        )
+    conn.autocommit = False
+    return conn
+
+
+class ConnectionPool:
+    def __init__(self, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE, timeout=DB_POOL_TIMEOUT, healthcheck_after=DB_POOL_HEALTHCHECK_AFTER):
+        self.pid = os.getpid()
+        self.min_size = min_size
+        self.max_size = max(max_size, 1)
+        self.timeout = timeout
+        self.healthcheck_after = healthcheck_after
+
+        self._cond = threading.Condition()
+        self._idle = []  # (conn, returned_at)
+        self._size = 0
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "max_wait_time": 0.0,
+            "timeouts": 0,
+            "connections_created": 0,
+            "connections_discarded": 0,
+            "healthcheck_failures": 0,
+        }
+
+        for _ in range(min(self.min_size, self.max_size)):
+            self._idle.append((_connect(), time.monotonic()))
+            self._size += 1
+            self._stats["connections_created"] += 1
+
+    def _discard(self, conn):
+        self._size -= 1
+        self._stats["connections_discarded"] += 1
+        self._cond.notify()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.healthcheck_after:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _record_checkout(self, waited):
+        self._stats["checkouts"] += 1
+        if waited is not None:
+            wait_time = time.monotonic() - waited
+            self._stats["wait_time"] += wait_time
+            self._stats["max_wait_time"] = max(self._stats["max_wait_time"], wait_time)
+
+    def getconn(self):
+        waited = None
+        while True:
+            with self._cond:
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                elif self._size < self.max_size:
+                    # Reserve the slot, connect outside the lock
+                    self._size += 1
+                    conn, returned_at = None, None
+                else:
+                    if waited is None:
+                        waited = time.monotonic()
+                        self._stats["waits"] += 1
+                    remaining = self.timeout - (time.monotonic() - waited)
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        self._stats["wait_time"] += time.monotonic() - waited
+                        raise PoolError("Connection pool exhausted")
+                    self._cond.wait(remaining)
+                    continue
+
+            if conn is None:
+                try:
+                    conn = _connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats["connections_created"] += 1
+                    self._record_checkout(waited)
+                return conn
+
+            if self._is_healthy(conn, returned_at):
+                with self._cond:
+                    self._record_checkout(waited)
+                return conn
+
+            logging.warning("Discarding unhealthy pooled database connection")
+            with self._cond:
+                self._stats["healthcheck_failures"] += 1
+                self._discard(conn)
+
+    def putconn(self, conn):
+        # Connections inherited from a parent process are never returned here
+        if os.getpid() != self.pid:
+            return
+
+        healthy = not conn.closed
+        if healthy and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                healthy = False
+        if healthy and conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            healthy = False
+
+        with self._cond:
+            if healthy:
+                conn.autocommit = False
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+            else:
+                self._discard(conn)
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats["size"] = self._size
+            stats["idle"] = len(self._idle)
+            stats["in_use"] = self._size - len(self._idle)
+            stats["min_size"] = self.min_size
+            stats["max_size"] = self.max_size
+            stats["pid"] = self.pid
+        return stats
+
+
+# Names for server-side cursors; only need to be unique per connection
+_cursor_names = itertools.count(1)
+
+
+def _tuple_cursor(named):
+    return psycopg2.extras.NamedTupleCursor if named else psycopg2.extensions.cursor
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# Connections inherited across fork; kept referenced so garbage collection
+# in the child never closes sockets the parent is still using.
+_inherited_connections = []
+
+
+def get_pool():
+    global _pool
+    pool = _pool
+    if pool is not None and pool.pid == os.getpid():
+        return pool
+
+    with _pool_lock:
+        if _pool is not None and _pool.pid != os.getpid():
+            logging.info(f"Process {os.getpid()} forked from {_pool.pid}, creating a fresh connection pool")
+            _inherited_connections.extend(conn for conn, _ in _pool._idle)
+            _pool = None
+        if _pool is None:
+            logging.info("Initializing database connection pool")
+            _pool = ConnectionPool()
+        return _pool
+
+
+def _copy_field(value):
+    # COPY csv reads an unquoted empty field as NULL, so every value is quoted
+    # and only None is left empty; '' then stays '' as it does with INSERT
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
+
 
 class DB:
     def __init__(self):
-        logging.info("Initializing database connection")
+        self.conn = None
         self.connect()
 
     def connect(self):
-        if DATABASE_URL:
-            self.conn = psycopg2.connect(DATABASE_URL, cursor_factory=psycopg2.extras.RealDictCursor)
-        else:
-            self.conn = psycopg2.connect(
-                user=DB_USERNAME,
-                password=DB_PASSWORD,
-                database=DATABASE_NAME,
-                host=DB_HOST,
-                port=DB_PORT,
-                cursor_factory=psycopg2.extras.RealDictCursor
-            )
-        self.conn.autocommit = False
+        self.pool = get_pool()
+        self.conn = self.pool.getconn()
+
+    def _record(self, sql, start, rows):
+        if not isinstance(sql, str):
+            sql = sql.as_string(self.conn)
+        record_query(sql, time.perf_counter() - start, rows)
 
     def select(self, sql, params=None):
+        start = time.perf_counter()
         with self.conn.cursor() as cursor:
             cursor.execute(sql, params)
-            return cursor.fetchall()
+            rows = cursor.fetchall()
+        self._record(sql, start, len(rows))
+        return rows
+
+    def select_tuples(self, sql, params=None, named=False):
+        # Like select(), but rows are plain tuples (namedtuples with named=True)
+        # in the column order of the query rather than a dict per row
+        start = time.perf_counter()
+        with self.conn.cursor(cursor_factory=_tuple_cursor(named)) as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        self._record(sql, start, len(rows))
+        return rows
+
+    def iter_tuples(self, sql, params=None, named=False, itersize=DB_ITERSIZE):
+        # Streams rows from a server-side cursor, itersize rows per round trip,
+        # so a large range is never held in memory at once. The cursor lives
+        # in the current transaction: consume it before commit/rollback.
+        start = time.perf_counter()
+        count = 0
+        with self.conn.cursor(f"nis_iter_{next(_cursor_names)}", cursor_factory=_tuple_cursor(named)) as cursor:
+            cursor.itersize = itersize
+            cursor.execute(sql, params)
+            for row in cursor:
+                count += 1
+                yield row
+        self._record(sql, start, count)
 
     def execute(self, sql, params=None):
+        start = time.perf_counter()
         with self.conn.cursor() as cursor:
             cursor.execute(sql, params)
-            return cursor.rowcount
+            rowcount = cursor.rowcount
+        self._record(sql, start, rowcount)
+        return rowcount
+
+    def execute_many(self, sql, argslist, template=None, page_size=DB_BATCH_PAGE_SIZE):
+        # sql must contain a single "VALUES %s" placeholder, expanded page_size rows at a time
+        start = time.perf_counter()
+        rowcount = 0
+        with self.conn.cursor() as cursor:
+            for offset in range(0, len(argslist), page_size):
+                psycopg2.extras.execute_values(cursor, sql, argslist[offset:offset + page_size], template=template, page_size=page_size)
+                rowcount += cursor.rowcount
+        self._record(sql, start, rowcount)
+        return rowcount
+
+    def copy_rows(self, table, columns, rows):
+        start = time.perf_counter()
+        buffer = io.StringIO()
+        buffer.writelines(",".join(map(_copy_field, row)) + "\n" for row in rows)
+        buffer.seek(0)
+        statement = pgsql.SQL("COPY {} ({}) FROM STDIN WITH (FORMAT csv)").format(
+            pgsql.Identifier(table),
+            pgsql.SQL(", ").join(pgsql.Identifier(c) for c in columns)
+        )
+        with self.conn.cursor() as cursor:
+            cursor.copy_expert(statement, buffer)
+            rowcount = cursor.rowcount
+        self._record(statement, start, rowcount)
+        return rowcount
+
+    def insert_rows(self, table, columns, rows):
+        if len(rows) >= DB_COPY_THRESHOLD:
+            return self.copy_rows(table, columns, rows)
+        statement = pgsql.SQL("INSERT INTO {} ({}) VALUES %s").format(
+            pgsql.Identifier(table),
+            pgsql.SQL(", ").join(pgsql.Identifier(c) for c in columns)
+        )
+        return self.execute_many(statement.as_string(self.conn), rows)
+
+    def savepoint(self, name):
+        self.execute(pgsql.SQL("SAVEPOINT {}").format(pgsql.Identifier(name)))
+
+    def release_savepoint(self, name):
+        self.execute(pgsql.SQL("RELEASE SAVEPOINT {}").format(pgsql.Identifier(name)))
+
+    def rollback_to_savepoint(self, name):
+        self.execute(pgsql.SQL("ROLLBACK TO SAVEPOINT {}").format(pgsql.Identifier(name)))
 
     def commit(self):
         self.conn.commit()
@@ -39,5 +309,6 @@ class DB:
         self.conn.rollback()
 
     def close(self):
-        self.conn.close()
-
+        if self.conn is not None:
+            self.pool.putconn(self.conn)
+            self.conn = None
@@ -1,9 +1,16 @@
 from flask import g
 from databaseManagement import DB
+from migrations import migrate
+
+_schema_ready = False
 
 def get_db():
+    global _schema_ready
     if "db" not in g:
         g.db = DB()
+        if not _schema_ready:
+            migrate(g.db)
+            _schema_ready = True
     return g.db
 
 def close_db(exception=None):
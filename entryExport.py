@@ -0,0 +1,113 @@
+import csv
+import io
+import json
+import threading
+import zlib
+from itertools import chain, islice
+from constants import DB_ITERSIZE, EXPORT_MAX_CONCURRENT
+from databaseManagement import DB
+from idTokens import encode_ids
+
+# Plain row exports of `input` for scripts. Rows come from a server-side
+# cursor and are encoded and compressed one batch at a time, so a response
+# never holds more than DB_ITERSIZE rows.
+
+EXPORT_FIELDS = ("id", "input_type", "type", "subtype", "amount", "receipts", "date_for", "submitted_by", "created_at", "updated_at")
+# Everything but id arrives as text, so rows are written out without per-value conversion
+EXPORT_COLUMNS = (
+    "id, input_type, type, subtype, amount::text, receipts, to_char(date_for, 'YYYY-MM-DD'), submitted_by, "
+    "to_char(created_at, 'YYYY-MM-DD\"T\"HH24:MI:SS'), to_char(updated_at, 'YYYY-MM-DD\"T\"HH24:MI:SS')"
+)
+# Leads with date_for, so the cursor plan walks a date_for index and sorts one
+# day at a time (incremental sort) instead of the whole range
+EXPORT_ORDER = "date_for, COALESCE(input_type, ''), type, subtype, id"
+
+EXPORT_MIMETYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _batches(rows):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, DB_ITERSIZE))
+        if not batch:
+            return
+        tokens = encode_ids([row[0] for row in batch])
+        yield [(token,) + row[1:] for token, row in zip(tokens, batch)]
+
+
+def _csv_chunks(rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    for batch in _batches(rows):
+        writer.writerows(batch)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _ndjson_chunks(rows):
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    for batch in _batches(rows):
+        yield "".join(encode(dict(zip(EXPORT_FIELDS, row))) + "\n" for row in batch)
+
+
+FORMATS = {
+    "csv": _csv_chunks,
+    "ndjson": _ndjson_chunks,
+}
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_chunks(rows, fmt, gzip=False):
+    # rows: (id, *EXPORT_COLUMNS[1:]) tuples -> bytes chunks of the response body
+    chunks = (chunk.encode() for chunk in FORMATS[fmt](rows))
+    return _gzip(chunks) if gzip else chunks
+
+
+class ExportBusy(Exception):
+    pass
+
+
+_slots = threading.BoundedSemaphore(EXPORT_MAX_CONCURRENT)
+
+
+def open_export(sql, params, fmt, gzip=False):
+    # Takes an export slot and a connection of its own and runs the query
+    # before any of the response is sent, so those failures can still become
+    # an error status. -> (body chunks, close); close() gives both back and
+    # must be called once the response is done (Response.call_on_close).
+    if not _slots.acquire(blocking=False):
+        raise ExportBusy("Too many exports in progress")
+    db = None
+    try:
+        db = DB()
+        rows = db.iter_tuples(sql, params)
+        first = list(islice(rows, 1))
+    except BaseException:
+        if db is not None:
+            db.close()
+        _slots.release()
+        raise
+
+    def close():
+        try:
+            rows.close()
+            db.close()
+        finally:
+            _slots.release()
+
+    return export_chunks(chain(first, rows), fmt, gzip), close
@@ -1,7 +1,10 @@
+import weakref
+from copy import copy
 from openpyxl.styles import Font, Border, Side, Alignment
 
 THICK = Side(style="thick")
 THIN = Side(style="thin")
+NO_SIDE = Side()
 
 BOLD = Font(bold=True)
 
@@ -10,39 +13,81 @@ RIGHT = Alignment(horizontal="right", vertical="center")
 CENTER = Alignment(horizontal="center", vertical="center")
 LEFT_WRAP = Alignment(horizontal="left", vertical="center", wrap_text=True)
 
-NO_BORDER = Border()
+_BORDERS = {}
 
-def write_cell(ws, row, col, value=None, font=None, align=None, border=None):
-    cell = ws.cell(row=row, column=col)
-    if value is not None:
-        cell.value = value
+
+def border(left=False, right=False, top=False, bottom=False):
+    # One shared Border per combination of thick edges
+    key = (left, right, top, bottom)
+    if key not in _BORDERS:
+        _BORDERS[key] = Border(
+            left=THICK if left else NO_SIDE,
+            right=THICK if right else NO_SIDE,
+            top=THICK if top else NO_SIDE,
+            bottom=THICK if bottom else NO_SIDE,
+        )
+    return _BORDERS[key]
+
+
+# excelLayout style names
+FONTS = {"bold": BOLD}
+ALIGNMENTS = {"left": LEFT, "right": RIGHT, "center": CENTER, "left_wrap": LEFT_WRAP}
+
+
+def planned_style(cell):
+    # (font, alignment, border) for an excelLayout.Cell
+    return FONTS.get(cell.font), ALIGNMENTS.get(cell.align), border(*cell.border) if cell.border else None
+
+
+class CellStyles:
+    # Every font/alignment/border assignment makes openpyxl hash the style
+    # object and compare it with the workbook's existing ones to find its id.
+    # This remembers the resulting style ids per (starting style, change), so
+    # each combination goes through openpyxl once and later cells copy the ids.
+    def __init__(self):
+        self._memo = {}
+
+    def _restyle(self, cell, key, change, keep=()):
+        key = (cell._style.tobytes() if cell._style is not None else b"", key)
+        entry = self._memo.get(key)
+        if entry is None:
+            change(cell)
+            # keep holds the objects whose ids are in the key, so the ids stay unique
+            self._memo[key] = entry = (copy(cell._style), keep)
+        else:
+            cell._style = copy(entry[0])
+
+    def apply(self, cell, font=None, align=None, border=None):
+        # Keyed by object identity, so pass shared style objects (the constants
+        # above, border()) rather than building new ones per cell
+        self._restyle(cell, ("apply", id(font), id(align), id(border)), lambda c: _assign(c, font, align, border), (font, align, border))
+
+
+def _assign(cell, font, align, border):
     if font:
         cell.font = font
     if align:
         cell.alignment = align
     if border:
         cell.border = border
-    return cell
 
 
-def merge_and_style(ws, r1, c1, r2, c2, value=None, font=None, align=None, border=None):
-    ws.merge_cells(start_row=r1, start_column=c1, end_row=r2, end_column=c2)
+_cell_styles = weakref.WeakKeyDictionary()
+
+
+def cell_styles(ws):
+    # Style ids are per workbook, so is the memo
+    styles = _cell_styles.get(ws.parent)
+    if styles is None:
+        styles = _cell_styles[ws.parent] = CellStyles()
+    return styles
 
-    for r in range(r1, r2 + 1):
-        for c in range(c1, c2 + 1):
-            write_cell(ws, r, c, font=font, align=align, border=border)
 
+def write_cell(ws, row, col, value=None, font=None, align=None, border=None):
+    cell = ws.cell(row=row, column=col)
     if value is not None:
-        ws.cell(row=r1, column=c1).value = value
-
-
-def draw_outer_border(ws, start_row, start_col, end_row, end_col):
-    for r in range(start_row, end_row + 1):
-        for c in range(start_col, end_col + 1):
-            cell = ws.cell(row=r, column=c)
-            cell.border = Border(
-                left=THICK if c == start_col else cell.border.left,
-                right=THICK if c == end_col else cell.border.right,
-                top=THICK if r == start_row else cell.border.top,
-                bottom=THICK if r == end_row else cell.border.bottom,
-            )
+        cell.value = value
+    if font or align or border:
+        cell_styles(ws).apply(cell, font, align, border)
+    return cell
+
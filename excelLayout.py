@@ -0,0 +1,274 @@
+import re
+from collections import namedtuple
+from decimal import Decimal
+from functools import lru_cache
+from constants import INPUT_TYPE_SUBTYPES
+
+# Layout of the expense register, worked out before anything is rendered.
+# plan_register() turns the column map and the row counts into a RegisterPlan:
+# the heading, header and total cells with their values, styles and borders,
+# the table outlines, merges and column widths. iter_register_rows() expands
+# it row by row, with the data values filled in, for whichever backend is
+# writing the sheet. Styles are plain names so this module never imports
+# openpyxl. Plans depend only on the shape of the data and are cached on it,
+# and their size does not grow with the number of rows.
+
+START_ROW = 3
+START_COL = 2
+COL_GAP = 1
+GAP_WIDTH = 3
+COLUMN_WIDTH = 18
+WIDTH_COLUMNS = 50
+TITLE_MERGE = (1, 2, 1, 15)
+
+BOLD = "bold"
+LEFT = "left"
+RIGHT = "right"
+CENTER = "center"
+LEFT_WRAP = "left_wrap"
+
+# Borders are (left, right, top, bottom) thick-edge flags
+BOX = (True, True, True, True)
+
+Cell = namedtuple("Cell", ["value", "font", "align", "border"])
+# Rows start_row + 2 to end_row are the table body: data rows, padding, subtotal
+Table = namedtuple("Table", ["type", "input_type", "subtype", "start_row", "end_row", "start_col", "end_col"])
+RegisterPlan = namedtuple("RegisterPlan", ["rows", "tables", "merges", "widths", "max_row"])
+
+
+CELL_REF = re.compile(r"([A-Z]+)([0-9]+)")
+
+
+def column_letter(col):
+    letters = ""
+    while col > 0:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _parse_ref(ref):
+    letters, row = CELL_REF.fullmatch(ref).groups()
+    col = 0
+    for letter in letters:
+        col = col * 26 + ord(letter) - 64
+    return int(row), col
+
+
+def _sorted_columns(columns):
+    return sorted(columns, key=lambda c: c["name"] != "Amount(₹)")
+
+
+def register_shape(column_map, db_data):
+    # Everything the layout depends on: column names and, per table, how many
+    # data rows it has and how wide they are
+    input_types = list(INPUT_TYPE_SUBTYPES)
+    types_list = list(column_map)
+    columns = tuple(
+        (type_name, tuple((subtype, tuple(c["name"] for c in _sorted_columns(cols))) for subtype, cols in column_map[type_name].items()))
+        for type_name in types_list
+    )
+
+    subtypes = sorted({s for subtypes in INPUT_TYPE_SUBTYPES.values() for s in subtypes})
+    max_rows = tuple(
+        max([1] + [len(db_data.get(t, {}).get(it, {}).get(subtype, [])) for t in types_list for it in input_types])
+        for subtype in subtypes
+    )
+
+    counts = []
+    for type_name in types_list:
+        for input_type in input_types:
+            for subtype in INPUT_TYPE_SUBTYPES[input_type]:
+                rows = db_data.get(type_name, {}).get(input_type, {}).get(subtype, [])
+                counts.append((len(rows), max((len(r) for r in rows), default=0)))
+    return columns, tuple(zip(subtypes, max_rows)), tuple(counts)
+
+
+def plan_register(column_map, db_data):
+    return _plan(register_shape(column_map, db_data))
+
+
+@lru_cache(maxsize=64)
+def _plan(shape):
+    columns, max_rows, counts = shape
+    column_map = {type_name: dict(subtypes) for type_name, subtypes in columns}
+    subtype_max_rows = dict(max_rows)
+    input_types = list(INPUT_TYPE_SUBTYPES)
+    types_list = [type_name for type_name, _ in columns]
+    counts = iter(counts)
+
+    start_rows = {}
+    column_heights = []
+    for input_type in input_types:
+        start_rows[input_type] = {}
+        row = START_ROW
+        for subtype in INPUT_TYPE_SUBTYPES[input_type]:
+            start_rows[input_type][subtype] = row
+            row += subtype_max_rows[subtype] + 4
+        column_heights.append(row - START_ROW)
+    earnings_totals_row = START_ROW + max(column_heights) + 1
+    payments_totals_row = earnings_totals_row + 2
+    totals_rows = {input_type: earnings_totals_row if input_type == "EARNINGS" else payments_totals_row for input_type in input_types}
+
+    type_columns = {}
+    gap_columns = []
+    col = START_COL
+    for idx, type_name in enumerate(types_list):
+        width = max([2] + [len(c) for c in column_map[type_name].values()])
+        type_columns[type_name] = {}
+        for input_type in input_types:
+            type_columns[type_name][input_type] = col
+            col += width
+        if idx < len(types_list) - 1:
+            gap_columns.append(col)
+            col += COL_GAP
+    subtype_totals_cols = {input_type: col + 1 if input_type == "EARNINGS" else col + 4 for input_type in input_types}
+    max_data_col = col + 6
+
+    cells = {}
+    used_cols = {TITLE_MERGE[1]}
+    merges = [TITLE_MERGE]
+    tables = []
+
+    def put(row, col, value=None, font=None, align=None, border=None):
+        cells.setdefault(row, {})[col] = Cell(value, font, align, border)
+        if value is not None and value != "":
+            used_cols.add(col)
+
+    for c in range(TITLE_MERGE[1], TITLE_MERGE[3] + 1):
+        put(1, c, font=BOLD, align=LEFT)
+
+    type_refs = {}
+    subtype_refs = {}
+    for type_name in types_list:
+        for input_type in input_types:
+            c0 = type_columns[type_name][input_type]
+            for subtype in INPUT_TYPE_SUBTYPES[input_type]:
+                data_rows, widest = next(counts)
+                if subtype not in column_map[type_name]:
+                    continue
+                names = column_map[type_name][subtype]
+                start_row = start_rows[input_type][subtype]
+                end_row = start_row + 2 + subtype_max_rows[subtype]
+                c1 = c0 + len(names) - 1
+                tables.append(Table(type_name, input_type, subtype, start_row, end_row, c0, c1))
+                used_cols.update(range(c0, c0 + widest))
+
+                for c in range(c0, c1 + 1):
+                    put(start_row, c, f"{type_name} - {subtype}" if c == c0 else None, BOLD, LEFT, BOX)
+                if c1 > c0:
+                    merges.append((start_row, c0, start_row, c1))
+                for c, name in enumerate(names, start=c0):
+                    put(start_row + 1, c, name, BOLD, LEFT, BOX)
+
+                letter = column_letter(c0)
+                formula = f"=SUM({letter}{start_row + 2}:{letter}{start_row + 1 + data_rows})" if data_rows else 0
+                put(end_row, c0, formula, BOLD, RIGHT, BOX)
+                put(end_row, c0 + 1, "SUBTOTAL", BOLD, LEFT, _body_border(c0 + 1, end_row, c0, c1, end_row))
+
+                ref = f"{letter}{end_row}"
+                type_refs.setdefault((type_name, input_type), []).append(ref)
+                subtype_refs.setdefault(subtype, []).append(ref)
+
+    total_refs = {input_type: [] for input_type in input_types}
+    for type_name in types_list:
+        for input_type in input_types:
+            col = type_columns[type_name][input_type]
+            row = totals_rows[input_type]
+            refs = type_refs.get((type_name, input_type))
+            total_refs[input_type].append(f"{column_letter(col)}{row}")
+            put(row, col, f"=SUM({','.join(refs)})" if refs else 0, BOLD, RIGHT, BOX)
+            put(row, col + 1, f"{type_name} {input_type}", BOLD, LEFT)
+
+    for input_type in input_types:
+        col = subtype_totals_cols[input_type]
+        for subtype, start_row in start_rows[input_type].items():
+            row = start_row + 2 + subtype_max_rows[subtype]
+            refs = subtype_refs.get(subtype)
+            put(row, col, f"=SUM({','.join(refs)})" if refs else 0, BOLD, RIGHT, BOX)
+            put(row, col + 1, f"{subtype} TOTAL", BOLD, LEFT)
+
+    for input_type in ("EARNINGS", "PAYMENTS"):
+        col = subtype_totals_cols[input_type]
+        row = totals_rows[input_type]
+        refs = total_refs.get(input_type)
+        put(row, col, f"=SUM({','.join(refs)})" if refs else 0, BOLD, RIGHT, BOX)
+        put(row, col + 1, f"{input_type} TOTAL", BOLD, LEFT)
+
+    widths = []
+    for col in range(1, max(WIDTH_COLUMNS, max_data_col + 1)):
+        width = COLUMN_WIDTH
+        if col == 1 or col in gap_columns or (col <= max_data_col and col not in used_cols):
+            width = GAP_WIDTH
+        if col < WIDTH_COLUMNS or width != COLUMN_WIDTH:
+            widths.append((col, width))
+
+    rows = tuple((row, tuple(sorted(cells[row].items()))) for row in sorted(cells))
+    return RegisterPlan(rows, tuple(tables), tuple(merges), tuple(widths), max(cells))
+
+
+def _body_border(c, r, c0, c1, end_row):
+    if c < c0 or c > c1:
+        return None
+    return (c == c0, c == c1, False, r == end_row)
+
+
+def iter_register_rows(plan, db_data, report_date):
+    # Yields (row number, {col: Cell}) for rows 1 to plan.max_row in order,
+    # with the report title and the data rows filled in
+    planned = dict(plan.rows)
+    pending = sorted(plan.tables, key=lambda t: t.start_row)
+    active = []
+    for r in range(1, plan.max_row + 1):
+        while pending and pending[0].start_row + 2 <= r:
+            table = pending.pop(0)
+            rows = db_data.get(table.type, {}).get(table.input_type, {}).get(table.subtype, [])
+            active.append((table, rows))
+        active = [(t, rows) for t, rows in active if t.end_row >= r]
+
+        cells = {}
+        for table, rows in active:
+            for c in range(table.start_col, table.end_col + 1):
+                cells[c] = Cell(None, None, None, _body_border(c, r, table.start_col, table.end_col, table.end_row))
+        cells.update(planned.get(r, ()))
+        if r == TITLE_MERGE[0]:
+            cells[TITLE_MERGE[1]] = cells[TITLE_MERGE[1]]._replace(value=f"Expense Register — {report_date}")
+
+        for table, rows in active:
+            k = r - table.start_row - 2
+            if k < len(rows):
+                for j, value in enumerate(rows[k], start=table.start_col):
+                    current = cells.get(j)
+                    cells[j] = Cell(value, None, CENTER if j == table.start_col else LEFT_WRAP, current.border if current else None)
+        yield r, cells
+
+
+def _evaluate_sum(formula, values):
+    # Plans only contain =SUM() over cell references and ranges
+    total = 0
+    for part in formula[len("=SUM("):-1].split(","):
+        first, _, last = part.partition(":")
+        r1, c1 = _parse_ref(first)
+        r2, c2 = _parse_ref(last) if last else (r1, c1)
+        for r in range(r1, r2 + 1):
+            for c in range(c1, c2 + 1):
+                total += values.get((r, c), 0)
+    return total
+
+
+def iter_register_values(plan, db_data, report_date):
+    # Like iter_register_rows, but yields (row number, cells, {col: value})
+    # with the formulas computed, for backends that cannot evaluate them.
+    # Every formula only refers to cells above it or to its left, so one pass
+    # is enough.
+    numbers = {}
+    for r, cells in iter_register_rows(plan, db_data, report_date):
+        values = {}
+        for c in sorted(cells):
+            value = cells[c].value
+            if isinstance(value, str) and value.startswith("=SUM("):
+                value = _evaluate_sum(value, numbers)
+            if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+                numbers[(r, c)] = value
+            values[c] = value
+        yield r, cells, values
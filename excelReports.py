@@ -0,0 +1,25 @@
+from openpyxl import Workbook
+
+from excelOrchestration import render_register
+from excelStreaming import write_register_streaming
+
+
+def generate_excel_range(column_map, db_data, db_data_by_date, start_date, end_date, per_day=False, streaming=False):
+    report_range = f"{start_date.strftime('%d-%m-%Y')} to {end_date.strftime('%d-%m-%Y')}"
+    sheets = [("Summary", db_data, report_range)]
+    if per_day:
+        for day in sorted(db_data_by_date):
+            label = day.strftime('%d-%m-%Y')
+            sheets.append((label, db_data_by_date[day], label))
+
+    if streaming:
+        wb = Workbook(write_only=True)
+        for title, data, report_date in sheets:
+            write_register_streaming(wb, title, column_map, data, report_date)
+        return wb
+
+    wb = Workbook()
+    wb.remove(wb.active)
+    for title, data, report_date in sheets:
+        render_register(wb.create_sheet(title), column_map, data, report_date)
+    return wb
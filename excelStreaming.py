@@ -0,0 +1,54 @@
+import tempfile
+from datetime import date
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+
+from excelHelpers import cell_styles, planned_style
+from excelLayout import plan_register, iter_register_rows, column_letter
+
+
+def generate_excel_streaming(column_map, db_data, report_date=None):
+    wb = Workbook(write_only=True)
+    write_register_streaming(wb, "Expense Register", column_map, db_data, report_date)
+    return wb
+
+
+def write_register_streaming(wb, title, column_map, db_data, report_date=None):
+    if report_date is None:
+        report_date = date.today().strftime('%d-%m-%Y')
+
+    plan = plan_register(column_map, db_data)
+    ws = wb.create_sheet(title)
+
+    for col, width in plan.widths:
+        ws.column_dimensions[column_letter(col)].width = width
+
+    for r1, c1, r2, c2 in plan.merges:
+        ws.merged_cells.add(f"{column_letter(c1)}{r1}:{column_letter(c2)}{r2}")
+
+    for _, cells in iter_register_rows(plan, db_data, report_date):
+        _append(ws, cells)
+
+    return ws
+
+
+def _append(ws, cells):
+    if not cells:
+        ws.append([])
+        return
+    styles = cell_styles(ws)
+    row = [None] * max(cells)
+    for col, planned in cells.items():
+        cell = WriteOnlyCell(ws, value=planned.value)
+        font, align, cell_border = planned_style(planned)
+        if font or align or cell_border:
+            styles.apply(cell, font, align, cell_border)
+        row[col - 1] = cell
+    ws.append(row)
+
+
+def save_to_tempfile(wb):
+    output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
+    return output
@@ -2,7 +2,7 @@ import logging
 from flask import request
 from flask_wtf import FlaskForm
 from wtforms.validators import InputRequired, Length, EqualTo, AnyOf
-from wtforms import StringField, PasswordField, HiddenField, SubmitField, SelectField, DateField
+from wtforms import StringField, PasswordField, HiddenField, SubmitField, SelectField, DateField, BooleanField
 
 
 class SignUp(FlaskForm):
@@ -126,8 +126,20 @@ class FetchExcel(FlaskForm):
         super(FetchExcel, self).__init__(*args, **kwargs)
         logging.info("FetchExcel form initialized")
 
+class FetchExcelRange(FlaskForm):
+    StartDate = DateField("From", validators=[InputRequired()])
+    EndDate = DateField("To", validators=[InputRequired()])
+    PerDay = BooleanField("One sheet per day")
+    DownloadRange = SubmitField("Download Range")
+
+    def __init__(self, *args, **kwargs):
+        super(FetchExcelRange, self).__init__(*args, **kwargs)
+        logging.info("FetchExcelRange form initialized")
+
 class SubmitData(FlaskForm):
     rowData = HiddenField("rowData", validators=[InputRequired()], id="rowData")
+    # Ledger page cursor, so the redirect lands back on the page being edited
+    after = HiddenField(id="submitAfter")
     
     SubmitData = SubmitField("Submit Table")
     
@@ -145,6 +157,7 @@ class FetchTableData(FlaskForm):
 class DeleteRow(FlaskForm):
     rowID = HiddenField("rowID", validators=[InputRequired()], id="rowID")
     date = HiddenField(id="deleteDate", validators=[InputRequired()])
+    after = HiddenField(id="deleteAfter")
     DeleteRow = SubmitField("✕")
     
     def __init__(self, *args, **kwargs):
@@ -0,0 +1,128 @@
+import logging
+import pickle
+import threading
+from collections import OrderedDict
+from constants import LEDGER_CACHE_SIZE, LEDGER_CACHE_SHARED
+
+
+# Every write to `input` bumps the version of the dates it touches (table
+# input_versions, see migrations.py) in the same transaction, so cache keys
+# embedding the version go stale on commit for every worker at once.
+
+VERSION_SQL = "SELECT version FROM input_versions WHERE date_for = %s"
+BUMP_VERSIONS_FOR_IDS_SQL = """INSERT INTO input_versions (date_for, version)
+SELECT DISTINCT date_for, 1 FROM input WHERE id = ANY(%s)
+ORDER BY date_for
+ON CONFLICT (date_for) DO UPDATE SET version = input_versions.version + 1
+RETURNING date_for"""
+
+
+def get_version(db, date_for):
+    rows = db.select(VERSION_SQL, (date_for,))
+    return rows[0]["version"] if rows else 0
+
+
+def bump_versions(db, dates):
+    dates = sorted(set(dates))
+    if not dates:
+        return
+    db.execute_many(
+        "INSERT INTO input_versions (date_for, version) VALUES %s ON CONFLICT (date_for) DO UPDATE SET version = input_versions.version + 1",
+        [(d, 1) for d in dates]
+    )
+
+
+def bump_versions_for_ids(db, ids):
+    ids = list(set(ids))
+    if not ids:
+        return []
+    rows = db.select(BUMP_VERSIONS_FOR_IDS_SQL, (ids,))
+    return [r["date_for"] for r in rows]
+
+
+class LRUCache:
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __len__(self):
+        return len(self._data)
+
+
+class LocalSharedTier(LRUCache):
+    # Stand-in for a cross-process store (e.g. memcached/redis); anything with
+    # get(key) -> bytes | None and set(key, bytes) can replace it. Bounded like
+    # the local tier, since every edit bumps a version and orphans old keys.
+    def __init__(self, maxsize=LEDGER_CACHE_SIZE):
+        super().__init__(maxsize)
+
+
+class LedgerCache:
+    def __init__(self, maxsize=LEDGER_CACHE_SIZE, shared=None):
+        self.local = LRUCache(maxsize)
+        self.shared = shared
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "shared_hits": 0, "misses": 0, "shared_errors": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get_or_load(self, db, date_for, scope, loader):
+        key = f"ledger:{date_for}:{scope}:{get_version(db, date_for)}"
+
+        value = self.local.get(key)
+        if value is not None:
+            self._count("hits")
+            return value
+
+        if self.shared is not None:
+            try:
+                payload = self.shared.get(key)
+            except Exception:
+                logging.exception("Shared ledger cache read failed")
+                payload = None
+                self._count("shared_errors")
+            if payload is not None:
+                value = pickle.loads(payload)
+                self.local.set(key, value)
+                self._count("shared_hits")
+                return value
+
+        self._count("misses")
+        value = loader()
+        self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+            except Exception:
+                logging.exception("Shared ledger cache write failed")
+                self._count("shared_errors")
+        return value
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["entries"] = len(self.local)
+        stats["maxsize"] = self.local.maxsize
+        stats["shared"] = type(self.shared).__name__ if self.shared is not None else None
+        return stats
+
+
+ledger_cache = LedgerCache(shared=LocalSharedTier() if LEDGER_CACHE_SHARED == "local" else None)
+
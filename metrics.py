@@ -0,0 +1,176 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from flask import g, has_request_context, request, template_rendered, before_render_template
+from constants import METRICS_MAX_QUERY_FINGERPRINTS
+
+# Per-process metrics: each gunicorn worker keeps (and serves) its own.
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_REPEATED_TUPLES = re.compile(r"(\([^()]*\))(?:\s*,\s*\([^()]*\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=1024)
+def fingerprint(sql):
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    sql = _REPEATED_TUPLES.sub(r"\1, ...", sql)
+    return _WHITESPACE.sub(" ", sql).strip()[:200]
+
+
+class Histogram:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+                break
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(BUCKETS, self.buckets):
+            cumulative += count
+            yield f"{name}_bucket{_labels(labels, le=repr(bound))} {cumulative}"
+        yield f"{name}_bucket{_labels(labels, le='+Inf')} {self.count}"
+        yield f"{name}_sum{_labels(labels)} {self.sum:.6f}"
+        yield f"{name}_count{_labels(labels)} {self.count}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Registry:
+    def __init__(self, max_queries=METRICS_MAX_QUERY_FINGERPRINTS):
+        self.max_queries = max_queries
+        self._lock = threading.Lock()
+        self.requests = {}
+        self.request_seconds = {}
+        self.phase_seconds = {}
+        self.query_seconds = {}
+        self.query_rows = {}
+
+    def observe_request(self, endpoint, method, status, seconds, phases):
+        with self._lock:
+            key = (endpoint, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.request_seconds.setdefault(endpoint, Histogram()).observe(seconds)
+            for phase, phase_seconds in phases.items():
+                self.phase_seconds.setdefault((endpoint, phase), Histogram()).observe(phase_seconds)
+
+    def observe_query(self, sql, seconds, rows):
+        query = fingerprint(sql)
+        with self._lock:
+            if query not in self.query_seconds and len(self.query_seconds) >= self.max_queries:
+                query = "other"
+            self.query_seconds.setdefault(query, Histogram()).observe(seconds)
+            self.query_rows[query] = self.query_rows.get(query, 0) + max(rows, 0)
+
+    def render(self):
+        out = []
+        with self._lock:
+            out.append("# HELP nisapp_http_requests_total Requests handled, by endpoint, method and status.")
+            out.append("# TYPE nisapp_http_requests_total counter")
+            for (endpoint, method, status), count in sorted(self.requests.items()):
+                out.append(f"nisapp_http_requests_total{_labels([('endpoint', endpoint), ('method', method), ('status', status)])} {count}")
+
+            out.append("# HELP nisapp_http_request_duration_seconds Request wall time by endpoint.")
+            out.append("# TYPE nisapp_http_request_duration_seconds histogram")
+            for endpoint, histogram in sorted(self.request_seconds.items()):
+                out.extend(histogram.lines("nisapp_http_request_duration_seconds", [("endpoint", endpoint)]))
+
+            out.append("# HELP nisapp_request_phase_duration_seconds Time spent per request in each phase (db, render, excel, ...).")
+            out.append("# TYPE nisapp_request_phase_duration_seconds histogram")
+            for (endpoint, phase), histogram in sorted(self.phase_seconds.items()):
+                out.extend(histogram.lines("nisapp_request_phase_duration_seconds", [("endpoint", endpoint), ("phase", phase)]))
+
+            out.append("# HELP nisapp_db_query_duration_seconds Statement execution time by statement fingerprint.")
+            out.append("# TYPE nisapp_db_query_duration_seconds histogram")
+            for query, histogram in sorted(self.query_seconds.items()):
+                out.extend(histogram.lines("nisapp_db_query_duration_seconds", [("query", query)]))
+
+            out.append("# HELP nisapp_db_query_rows_total Rows returned or affected by statement fingerprint.")
+            out.append("# TYPE nisapp_db_query_rows_total counter")
+            for query, rows in sorted(self.query_rows.items()):
+                out.append(f"nisapp_db_query_rows_total{_labels([('query', query)])} {rows}")
+        return "\n".join(out) + "\n"
+
+
+registry = Registry()
+
+
+def _add_phase(name, seconds):
+    phases = g.timing["phases"]
+    phases[name] = phases.get(name, 0.0) + seconds
+
+
+@contextmanager
+def phase(name):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and "timing" in g:
+            _add_phase(name, time.perf_counter() - start)
+
+
+def record_query(sql, seconds, rows):
+    registry.observe_query(sql, seconds, rows)
+    if has_request_context() and "timing" in g:
+        _add_phase("db", seconds)
+        g.timing["queries"] += 1
+
+
+def _start_timing():
+    g.timing = {"start": time.perf_counter(), "phases": {}, "queries": 0}
+
+
+def _finish_timing(response):
+    timing = g.pop("timing", None)
+    if timing is None:
+        return response
+    total = time.perf_counter() - timing["start"]
+    endpoint = request.endpoint or "unmatched"
+    registry.observe_request(endpoint, request.method, response.status_code, total, timing["phases"])
+
+    entries = [f"app;dur={total * 1000:.1f}"]
+    for name, seconds in timing["phases"].items():
+        desc = f';desc="{timing["queries"]} queries"' if name == "db" else ""
+        entries.append(f"{name};dur={seconds * 1000:.1f}{desc}")
+    response.headers["Server-Timing"] = ", ".join(entries)
+    return response
+
+
+def _before_render(sender, template, context, **extra):
+    if "timing" in g:
+        g.timing["render_start"] = time.perf_counter()
+
+
+def _after_render(sender, template, context, **extra):
+    if "timing" in g and "render_start" in g.timing:
+        _add_phase("render", time.perf_counter() - g.timing.pop("render_start"))
+
+
+def init_app(app):
+    # Registered before the other hooks so redirects from pre_request are timed too
+    app.before_request(_start_timing)
+    app.after_request(_finish_timing)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
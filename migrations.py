@@ -0,0 +1,149 @@
+import logging
+import time
+
+# Ordered, append-only. Each migration runs in its own transaction and is
+# recorded in schema_migrations; never edit one that has shipped, add a new one.
+# NisUsers and input predate this list and are not created here; migrations
+# start from the existing tables. Run them at deploy time with
+# `python migrations.py`; the first request of a worker still applies any
+# that are missing.
+
+INVALID_INDEX_SQL = """SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+    WHERE c.relname = %s AND NOT i.indisvalid"""
+
+
+def concurrent_index(name, definition):
+    # CREATE INDEX CONCURRENTLY does not block writes to the table, but cannot
+    # run inside a transaction, and a failed build leaves an INVALID index
+    # that IF NOT EXISTS would then keep, so that is dropped first
+    def create(db):
+        db.commit()
+        db.conn.autocommit = True
+        try:
+            if db.select(INVALID_INDEX_SQL, (name,)):
+                db.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            db.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
+        finally:
+            db.conn.autocommit = False
+    return create
+
+
+MIGRATIONS = [
+    (1, "input versions", [
+        """CREATE TABLE IF NOT EXISTS input_versions (
+            date_for DATE PRIMARY KEY,
+            version BIGINT NOT NULL DEFAULT 1
+        )""",
+    ]),
+    (2, "daily totals", [
+        """CREATE TABLE IF NOT EXISTS input_daily_totals (
+            date_for DATE NOT NULL,
+            type TEXT NOT NULL,
+            input_type TEXT NOT NULL,
+            subtype TEXT NOT NULL,
+            total NUMERIC NOT NULL,
+            row_count BIGINT NOT NULL,
+            PRIMARY KEY (date_for, type, input_type, subtype)
+        )""",
+        """INSERT INTO input_daily_totals (date_for, type, input_type, subtype, total, row_count)
+        SELECT date_for, type, COALESCE(input_type, 'UNKNOWN'), subtype, SUM(amount), COUNT(*)
+        FROM input
+        WHERE date_for IS NOT NULL
+        GROUP BY date_for, type, COALESCE(input_type, 'UNKNOWN'), subtype
+        ON CONFLICT DO NOTHING""",
+    ]),
+    (3, "access path indexes", [
+        # /manageexcel, /exportrange for admins: WHERE date_for = / BETWEEN
+        concurrent_index("input_date_for_idx", "input (date_for)"),
+        # same queries for users: AND UPPER(type) = %s
+        concurrent_index("input_upper_type_date_for_idx", "input (UPPER(type), date_for)"),
+        # login: WHERE Username = %s AND is_active (plain lookups use the primary key)
+        concurrent_index("nisusers_active_username_idx", "NisUsers (Username) WHERE is_active"),
+        "ANALYZE input",
+        "ANALYZE NisUsers",
+    ]),
+    (4, "shared state", [
+        # Used by sharedState.PostgresBackend; expiry times are epoch seconds
+        """CREATE UNLOGGED TABLE IF NOT EXISTS rate_limits (
+            key TEXT PRIMARY KEY,
+            count BIGINT NOT NULL,
+            expires_at DOUBLE PRECISION NOT NULL
+        )""",
+    ]),
+    (5, "session versions", [
+        "ALTER TABLE NisUsers ADD COLUMN IF NOT EXISTS session_version INTEGER NOT NULL DEFAULT 1",
+    ]),
+    (6, "ledger keyset index", [
+        # Paged ledger: WHERE date_for = %s AND (COALESCE(input_type, ''), type, subtype, id) > (...) ORDER BY the same
+        concurrent_index("input_date_keyset_idx", "input (date_for, (COALESCE(input_type, '')), type, subtype, id)"),
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(db):
+    if not db.select("SELECT to_regclass('schema_migrations') IS NOT NULL AS exists")[0]["exists"]:
+        return 0
+    return db.select("SELECT COALESCE(MAX(version), 0) AS version FROM schema_migrations")[0]["version"]
+
+
+def _lock(db):
+    # Session-level and polled rather than waited on inside a statement: a
+    # concurrent index build waits for every open snapshot, including one
+    # blocked on this lock
+    db.conn.autocommit = True
+    try:
+        while not db.select("SELECT pg_try_advisory_lock(hashtext('nisapp_schema_migrations')) AS locked")[0]["locked"]:
+            time.sleep(0.5)
+    finally:
+        db.conn.autocommit = False
+
+
+def _unlock(db):
+    db.rollback()
+    db.execute("SELECT pg_advisory_unlock(hashtext('nisapp_schema_migrations'))")
+    db.commit()
+
+
+def migrate(db):
+    version = current_version(db)
+    db.commit()
+    if version >= LATEST_VERSION:
+        return version
+
+    # Serialise workers booting at the same time; re-check under the lock
+    _lock(db)
+    try:
+        db.execute("CREATE TABLE IF NOT EXISTS schema_migrations (version INTEGER PRIMARY KEY, name TEXT NOT NULL, applied_at TIMESTAMP NOT NULL DEFAULT NOW())")
+        db.commit()
+        for number, name, statements in MIGRATIONS:
+            if db.select("SELECT 1 FROM schema_migrations WHERE version = %s", (number,)):
+                db.commit()
+                continue
+            try:
+                for statement in statements:
+                    if callable(statement):
+                        statement(db)
+                    else:
+                        db.execute(statement)
+                db.execute("INSERT INTO schema_migrations (version, name) VALUES (%s, %s)", (number, name))
+                db.commit()
+                logging.info(f"Applied schema migration {number}: {name}")
+            except Exception:
+                db.rollback()
+                logging.exception(f"Schema migration {number} ({name}) failed")
+                raise
+    finally:
+        _unlock(db)
+    return LATEST_VERSION
+
+
+if __name__ == "__main__":
+    from databaseManagement import DB
+    logging.basicConfig(level=logging.INFO)
+    db = DB()
+    try:
+        print(f"Schema at version {migrate(db)}")
+    finally:
+        db.close()
@@ -0,0 +1,174 @@
+import logging
+import multiprocessing
+import os
+import random
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+import bcrypt
+from constants import PASSWORD_BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS, PASSWORD_HASH_MAX_PENDING, PASSWORD_HASH_TIMEOUT, PASSWORD_HASH_EXECUTOR
+from sharedState import get_shared_state
+
+# bcrypt runs on a small pool so a burst of logins can only ever occupy
+# PASSWORD_HASH_WORKERS cores per process. Admission is counted across all
+# workers: each call holds one of PASSWORD_HASH_MAX_PENDING slots in the
+# shared state backend (a counter that is 1 for its holder and cleared on
+# release), so sync workers that each run one login at a time are still
+# bounded together. Once every slot is taken, further calls fail immediately
+# with PasswordHasherBusy. The per-process count below enforces the same
+# limit if the shared backend is unavailable.
+
+SLOT_KEY = "password_hash_slot:{}"
+# A slot left behind by a worker that died mid-hash is taken over after this
+SLOT_LEASE = 60
+
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+def _hash(password, rounds):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _check(password, hashed):
+    return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_pending = 0
+_stats = {"hashed": 0, "checked": 0, "rejected": 0, "timeouts": 0, "rehashed": 0, "slot_errors": 0}
+
+
+def _get_executor(reset=False):
+    global _executor, _executor_pid
+    with _executor_lock:
+        if reset or _executor is None or _executor_pid != os.getpid():
+            if PASSWORD_HASH_EXECUTOR == "process":
+                _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("fork"))
+            else:
+                # bcrypt releases the GIL while hashing, so threads use separate cores
+                _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _acquire_slot():
+    # -> the key of the slot taken, None if all are taken, or "" when the
+    # shared backend failed and only the per-process limit applies
+    backend = get_shared_state()
+    start = random.randrange(PASSWORD_HASH_MAX_PENDING)
+    try:
+        for i in range(PASSWORD_HASH_MAX_PENDING):
+            key = SLOT_KEY.format((start + i) % PASSWORD_HASH_MAX_PENDING)
+            if backend.incr(key, SLOT_LEASE) == 1:
+                return key
+    except Exception:
+        logging.exception("Could not take a password hashing slot, using the per-process limit")
+        with _executor_lock:
+            _stats["slot_errors"] += 1
+        return ""
+    return None
+
+
+def _release_slot(key):
+    if not key:
+        return
+    try:
+        get_shared_state().clear(key)
+    except Exception:
+        # The slot frees itself after SLOT_LEASE
+        logging.exception(f"Could not release password hashing slot {key}")
+        with _executor_lock:
+            _stats["slot_errors"] += 1
+
+
+def _release(slot, future=None):
+    global _pending
+    with _executor_lock:
+        _pending -= 1
+    _release_slot(slot)
+
+
+def _run(fn, *args):
+    # A task keeps its slot until it finishes, even when the caller has given
+    # up on it: cancel() cannot stop a hash that is already running
+    global _pending
+    with _executor_lock:
+        if _pending >= PASSWORD_HASH_MAX_PENDING:
+            _stats["rejected"] += 1
+            raise PasswordHasherBusy("Too many password operations in progress")
+        _pending += 1
+    slot = None
+    try:
+        slot = _acquire_slot()
+        if slot is None:
+            with _executor_lock:
+                _stats["rejected"] += 1
+            raise PasswordHasherBusy("Too many password operations in progress")
+        try:
+            future = _get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            logging.warning("Password hashing pool was broken, starting a new one")
+            future = _get_executor(reset=True).submit(fn, *args)
+    except BaseException:
+        _release(slot)
+        raise
+    future.add_done_callback(partial(_release, slot))
+
+    try:
+        return future.result(timeout=PASSWORD_HASH_TIMEOUT)
+    except FutureTimeoutError:
+        future.cancel()
+        with _executor_lock:
+            _stats["timeouts"] += 1
+        raise PasswordHasherBusy("Password operation timed out")
+
+
+def hash_password(password, rounds=PASSWORD_BCRYPT_ROUNDS):
+    hashed = _run(_hash, password, rounds)
+    with _executor_lock:
+        _stats["hashed"] += 1
+    return hashed
+
+
+def check_password(password, hashed):
+    result = _run(_check, password, hashed)
+    with _executor_lock:
+        _stats["checked"] += 1
+    return result
+
+
+def hash_rounds(hashed):
+    # $2b$12$<salt+hash>
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def needs_rehash(hashed):
+    return hash_rounds(hashed) != PASSWORD_BCRYPT_ROUNDS
+
+
+def rehash_if_needed(password, hashed):
+    # Called after a successful login, when the plaintext is at hand
+    if not needs_rehash(hashed):
+        return None
+    new_hash = _run(_hash, password, PASSWORD_BCRYPT_ROUNDS)
+    with _executor_lock:
+        _stats["rehashed"] += 1
+    return new_hash
+
+
+def stats():
+    with _executor_lock:
+        stats = dict(_stats)
+        stats["pending"] = _pending
+    stats["workers"] = PASSWORD_HASH_WORKERS
+    stats["max_pending"] = PASSWORD_HASH_MAX_PENDING
+    stats["rounds"] = PASSWORD_BCRYPT_ROUNDS
+    return stats
@@ -0,0 +1,79 @@
+import csv
+import html
+from datetime import date
+from excelLayout import plan_register, iter_register_values
+
+# CSV and HTML backends for the expense register, laid out by excelLayout
+# exactly like the Excel sheet (same rows and columns, totals computed).
+
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@")
+
+HTML_STYLES = {
+    "bold": "font-weight:bold",
+    "left": "text-align:left",
+    "right": "text-align:right",
+    "center": "text-align:center",
+    "left_wrap": "text-align:left;white-space:normal",
+}
+HTML_EDGES = ("border-left", "border-right", "border-top", "border-bottom")
+
+
+def _csv_value(value):
+    # Text starting like a formula is quoted so spreadsheet apps show it as text
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return "" if value is None else value
+
+
+def write_register_csv(output, column_map, db_data, report_date=None):
+    if report_date is None:
+        report_date = date.today().strftime('%d-%m-%Y')
+    writer = csv.writer(output)
+    for _, _, values in iter_register_values(plan_register(column_map, db_data), db_data, report_date):
+        row = [""] * max(values, default=0)
+        for c, value in values.items():
+            row[c - 1] = _csv_value(value)
+        writer.writerow(row)
+
+
+def _html_style(cell):
+    styles = [HTML_STYLES[name] for name in (cell.font, cell.align) if name]
+    if cell.border:
+        styles.extend(f"{edge}:2px solid #000" for edge, thick in zip(HTML_EDGES, cell.border) if thick)
+    return ";".join(styles)
+
+
+def write_register_html(output, column_map, db_data, report_date=None):
+    if report_date is None:
+        report_date = date.today().strftime('%d-%m-%Y')
+    plan = plan_register(column_map, db_data)
+
+    spans = {}
+    covered = set()
+    for r1, c1, r2, c2 in plan.merges:
+        spans[(r1, c1)] = (r2 - r1 + 1, c2 - c1 + 1)
+        covered.update((r, c) for r in range(r1, r2 + 1) for c in range(c1, c2 + 1) if (r, c) != (r1, c1))
+    last_col = max(col for col, _ in plan.widths)
+
+    output.write('<table style="border-collapse:collapse">\n<colgroup>')
+    output.write("".join(f'<col style="width:{width}ch">' for _, width in plan.widths))
+    output.write("</colgroup>\n")
+    for r, cells, computed in iter_register_values(plan, db_data, report_date):
+        output.write("<tr>")
+        for c in range(1, last_col + 1):
+            if (r, c) in covered:
+                continue
+            cell = cells.get(c)
+            attrs = ""
+            rowspan, colspan = spans.get((r, c), (1, 1))
+            if rowspan > 1:
+                attrs += f' rowspan="{rowspan}"'
+            if colspan > 1:
+                attrs += f' colspan="{colspan}"'
+            style = _html_style(cell) if cell else ""
+            if style:
+                attrs += f' style="{style}"'
+            value = computed.get(c)
+            output.write(f"<td{attrs}>{'' if value is None else html.escape(str(value))}</td>")
+        output.write("</tr>\n")
+    output.write("</table>\n")
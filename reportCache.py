@@ -0,0 +1,135 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from constants import REPORT_CACHE_DIR, REPORT_CACHE_MAX_BYTES
+
+# Rendered day registers on disk, named <date>.<key>.xlsx. The key hashes the
+# date, the role filter, the column map and the date's input_versions stamp,
+# and doubles as the ETag. Every write to `input` bumps the version, so
+# later lookups miss and render a fresh file; discard_dates() drops the stale
+# files right away instead of waiting for eviction. The directory is shared
+# by all workers, and the least recently served files are evicted once it
+# grows past REPORT_CACHE_MAX_BYTES.
+
+# Bump when the register layout changes, so files rendered by older code are not served
+ARTIFACT_FORMAT = 1
+
+ARTIFACT_PATTERN = re.compile(r"^(\d{4}-\d{2}-\d{2})\.([0-9a-f]{64})\.xlsx$")
+
+
+def artifact_key(date_for, scope, column_map, version):
+    payload = json.dumps([ARTIFACT_FORMAT, str(date_for), scope, column_map, version], separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ReportCache:
+    def __init__(self, directory=REPORT_CACHE_DIR, max_bytes=REPORT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "discards": 0, "errors": 0}
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _path(self, date_for, key):
+        return os.path.join(self.directory, f"{date_for}.{key}.xlsx")
+
+    def open(self, date_for, key):
+        # -> open binary file, or None on a miss. The file stays readable even
+        # if another worker evicts it while it is being sent.
+        path = self._path(date_for, key)
+        try:
+            f = open(path, "rb")
+        except FileNotFoundError:
+            self._count("misses")
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count("hits")
+        return f
+
+    def store(self, date_for, key, save):
+        # save(path) writes the artifact; -> the stored file opened for reading
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(date_for, key)
+        part_path = f"{path}.{os.getpid()}.{threading.get_ident()}.part"
+        try:
+            save(part_path)
+            os.replace(part_path, path)
+            f = open(path, "rb")
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+        self._count("stores")
+        self.evict(keep=path)
+        return f
+
+    def _entries(self):
+        entries = []
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return entries
+        for name in names:
+            match = ARTIFACT_PATTERN.match(name)
+            if not match:
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, match.group(1), path))
+        return entries
+
+    def _remove(self, path, stat):
+        try:
+            os.remove(path)
+            self._count(stat)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            logging.exception(f"Could not remove cached report {path}")
+            self._count("errors")
+
+    def evict(self, keep=None):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _, _ in entries)
+        for _, size, _, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            self._remove(path, "evictions")
+            total -= size
+
+    def discard_dates(self, dates):
+        dates = {str(d) for d in dates}
+        if not dates or not self.enabled:
+            return
+        for _, _, date_for, path in self._entries():
+            if date_for in dates:
+                self._remove(path, "discards")
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        entries = self._entries()
+        stats["entries"] = len(entries)
+        stats["bytes"] = sum(size for _, size, _, _ in entries)
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+
+report_cache = ReportCache()
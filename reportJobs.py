@@ -0,0 +1,150 @@
+import json
+import logging
+import multiprocessing
+import os
+import re
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from constants import REPORT_JOBS_DIR, REPORT_JOB_TTL, REPORT_JOB_WORKERS, REPORT_JOB_EXECUTOR
+
+# Job state lives on disk (<id>.json + <id>.xlsx) so any worker process can
+# answer status polls and downloads for a job another worker submitted.
+
+JOB_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_last_purge = 0.0
+
+
+# The renderers import the Excel modules (and openpyxl) on first use
+
+
+def _render_day(column_map, db_data, report_date):
+    from excelStreaming import generate_excel_streaming
+    return generate_excel_streaming(column_map, db_data, report_date)
+
+
+def _render_range(column_map, db_data, db_data_by_date, start_date, end_date, per_day):
+    from excelReports import generate_excel_range
+    return generate_excel_range(column_map, db_data, db_data_by_date, start_date, end_date, per_day, streaming=True)
+
+
+RENDERERS = {
+    "day": _render_day,
+    "range": _render_range,
+}
+
+
+def _meta_path(job_id):
+    return os.path.join(REPORT_JOBS_DIR, f"{job_id}.json")
+
+
+def _artifact_path(job_id):
+    return os.path.join(REPORT_JOBS_DIR, f"{job_id}.xlsx")
+
+
+def _write_meta(job_id, meta):
+    path = _meta_path(job_id)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, path)
+
+
+def _update_meta(job_id, **changes):
+    meta = get_job(job_id) or {}
+    meta.update(changes)
+    _write_meta(job_id, meta)
+
+
+def _run_job(job_id, renderer, args):
+    _update_meta(job_id, status="running", started_at=time.time())
+    try:
+        wb = RENDERERS[renderer](*args)
+        part_path = f"{_artifact_path(job_id)}.part"
+        wb.save(part_path)
+        os.replace(part_path, _artifact_path(job_id))
+        _update_meta(job_id, status="done", finished_at=time.time())
+    except Exception as e:
+        logging.exception(f"Report job {job_id} failed")
+        _update_meta(job_id, status="failed", finished_at=time.time(), error=str(e))
+
+
+def _get_executor(reset=False):
+    global _executor, _executor_pid
+    with _executor_lock:
+        if reset or _executor is None or _executor_pid != os.getpid():
+            if REPORT_JOB_EXECUTOR == "thread":
+                _executor = ThreadPoolExecutor(max_workers=REPORT_JOB_WORKERS, thread_name_prefix="report-job")
+            else:
+                # fork, not spawn: spawn re-imports __main__, which under gunicorn is the server itself
+                _executor = ProcessPoolExecutor(max_workers=REPORT_JOB_WORKERS, mp_context=multiprocessing.get_context("fork"))
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def submit_job(username, filename, renderer, args):
+    os.makedirs(REPORT_JOBS_DIR, exist_ok=True)
+    purge_expired()
+
+    job_id = secrets.token_urlsafe(18)
+    _write_meta(job_id, {
+        "id": job_id,
+        "status": "pending",
+        "username": username,
+        "filename": filename,
+        "created_at": time.time(),
+    })
+    try:
+        _get_executor().submit(_run_job, job_id, renderer, args)
+    except BrokenProcessPool:
+        logging.warning("Report job pool was broken, starting a new one")
+        _get_executor(reset=True).submit(_run_job, job_id, renderer, args)
+    logging.info(f"Report job {job_id} ({renderer}) submitted by {username}")
+    return job_id
+
+
+def get_job(job_id):
+    # Status polls and downloads purge too, so old files go even when no new job is submitted
+    purge_expired()
+    if not job_id or not JOB_ID_PATTERN.match(job_id):
+        return None
+    try:
+        with open(_meta_path(job_id)) as f:
+            meta = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    if time.time() - meta.get("created_at", 0) > REPORT_JOB_TTL:
+        return None
+    return meta
+
+
+def get_artifact_path(job_id):
+    meta = get_job(job_id)
+    if meta is None or meta.get("status") != "done":
+        return None
+    path = _artifact_path(job_id)
+    return path if os.path.exists(path) else None
+
+
+def purge_expired(force=False):
+    global _last_purge
+    now = time.time()
+    if not force and now - _last_purge < 60:
+        return
+    _last_purge = now
+
+    if not os.path.isdir(REPORT_JOBS_DIR):
+        return
+    for name in os.listdir(REPORT_JOBS_DIR):
+        path = os.path.join(REPORT_JOBS_DIR, name)
+        try:
+            if now - os.path.getmtime(path) > REPORT_JOB_TTL:
+                os.remove(path)
+        except OSError:
+            pass
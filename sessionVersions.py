@@ -0,0 +1,63 @@
+import threading
+import time
+from constants import SESSION_VERSION_TTL, SESSION_VERSION_CACHE_SIZE
+
+# NisUsers.session_version is stamped into the session at login and bumped by
+# edit_user/delete_user; a session whose stamp no longer matches (or whose
+# user is inactive) is logged out. Lookups are cached per process for
+# SESSION_VERSION_TTL seconds, so other workers notice a bump within the TTL.
+
+SESSION_STATE_SQL = "SELECT session_version, is_active FROM NisUsers WHERE Username = %s LIMIT 1"
+
+
+def load_session_state(db, username):
+    rows = db.select(SESSION_STATE_SQL, (username,))
+    if not rows:
+        return None
+    return rows[0]["session_version"], rows[0]["is_active"]
+
+
+class SessionVersionCache:
+    def __init__(self, ttl=SESSION_VERSION_TTL, maxsize=SESSION_VERSION_CACHE_SIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get(self, username, loader):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(username)
+            if entry is not None and entry[0] > now:
+                self._stats["hits"] += 1
+                return entry[1]
+            self._stats["misses"] += 1
+
+        state = loader()
+        with self._lock:
+            if len(self._data) >= self.maxsize:
+                self._data = {k: v for k, v in self._data.items() if v[0] > now}
+                if len(self._data) >= self.maxsize:
+                    self._data.clear()
+            self._data[username] = (now + self.ttl, state)
+        return state
+
+    def invalidate(self, username):
+        with self._lock:
+            self._data.pop(username, None)
+
+    def is_current(self, get_db, username, stamped_version):
+        # get_db is only called on a cache miss
+        state = self.get(username, lambda: load_session_state(get_db(), username))
+        return state is not None and state[1] and state[0] == stamped_version
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._data)
+        stats["ttl"] = self.ttl
+        return stats
+
+
+session_versions = SessionVersionCache()
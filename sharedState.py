@@ -0,0 +1,224 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+import psycopg2
+from abc import ABC, abstractmethod
+from limits.storage import Storage
+from constants import SHARED_STATE_BACKEND, SHARED_STATE_PATH
+from databaseManagement import get_pool
+
+# Rate-limit counters shared by every gunicorn worker. "sqlite" (a file on
+# the local disk) covers a single host, "postgres" (an UNLOGGED rate_limits
+# table) several hosts; "memory" is per process and only meant for
+# development. Each increment is a single primary-key upsert.
+
+PURGE_INTERVAL = 60
+
+
+class MemoryBackend:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+
+    def incr(self, key, expiry, amount=1):
+        now = time.time()
+        with self._lock:
+            count, expires_at = self._counters.get(key, (0, 0.0))
+            if expires_at <= now:
+                count, expires_at = 0, now + expiry
+            count += amount
+            self._counters[key] = (count, expires_at)
+            return count
+
+    def get(self, key):
+        with self._lock:
+            count, expires_at = self._counters.get(key, (0, 0.0))
+        return count if expires_at > time.time() else 0
+
+    def get_expiry(self, key):
+        with self._lock:
+            return self._counters.get(key, (0, time.time()))[1]
+
+    def clear(self, key):
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def reset(self):
+        with self._lock:
+            count = len(self._counters)
+            self._counters.clear()
+        return count
+
+    def check(self):
+        return True
+
+
+class SqlBackend(ABC):
+    # Statements use %s placeholders; expiry times are epoch seconds so both
+    # databases share the same SQL
+    INCR_SQL = """INSERT INTO rate_limits (key, count, expires_at) VALUES (%s, %s, %s)
+        ON CONFLICT (key) DO UPDATE SET
+            count = CASE WHEN rate_limits.expires_at <= %s THEN excluded.count ELSE rate_limits.count + excluded.count END,
+            expires_at = CASE WHEN rate_limits.expires_at <= %s THEN excluded.expires_at ELSE rate_limits.expires_at END
+        RETURNING count"""
+
+    def __init__(self):
+        self._last_purge = 0.0
+
+    @abstractmethod
+    def _run(self, sql, params=(), fetch=False):
+        # Runs one statement in its own transaction; -> the first row as a tuple if fetch
+        pass
+
+    def _purge(self, now):
+        if now - self._last_purge < PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        self._run("DELETE FROM rate_limits WHERE expires_at <= %s", (now,))
+
+    def incr(self, key, expiry, amount=1):
+        now = time.time()
+        self._purge(now)
+        return self._run(self.INCR_SQL, (key, amount, now + expiry, now, now), fetch=True)[0]
+
+    def get(self, key):
+        row = self._run("SELECT count FROM rate_limits WHERE key = %s AND expires_at > %s", (key, time.time()), fetch=True)
+        return row[0] if row else 0
+
+    def get_expiry(self, key):
+        row = self._run("SELECT expires_at FROM rate_limits WHERE key = %s", (key,), fetch=True)
+        return row[0] if row else time.time()
+
+    def clear(self, key):
+        self._run("DELETE FROM rate_limits WHERE key = %s", (key,))
+
+    def reset(self):
+        self._run("DELETE FROM rate_limits")
+
+    def check(self):
+        self._run("SELECT 1", fetch=True)
+        return True
+
+
+class SqliteBackend(SqlBackend):
+    def __init__(self, path=SHARED_STATE_PATH):
+        super().__init__()
+        self.path = path
+        self._local = threading.local()
+        self._statements = {}
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and self._local.pid == os.getpid():
+            return conn
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS rate_limits (key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL)")
+        self._local.conn = conn
+        self._local.pid = os.getpid()
+        return conn
+
+    def _run(self, sql, params=(), fetch=False):
+        statement = self._statements.get(sql)
+        if statement is None:
+            statement = self._statements[sql] = sql.replace("%s", "?")
+        cursor = self._conn().execute(statement, params)
+        return cursor.fetchone() if fetch else None
+
+
+class PostgresBackend(SqlBackend):
+    # Same table as migration 4; the limiter runs before any request reaches
+    # get_db() (and so migrate()), so the backend creates it itself
+    TABLE_SQL = """CREATE UNLOGGED TABLE IF NOT EXISTS rate_limits (
+        key TEXT PRIMARY KEY,
+        count BIGINT NOT NULL,
+        expires_at DOUBLE PRECISION NOT NULL
+    )"""
+
+    def __init__(self):
+        super().__init__()
+        self._ready = False
+
+    def _run(self, sql, params=(), fetch=False):
+        if not self._ready:
+            try:
+                self._execute(self.TABLE_SQL)
+            except (psycopg2.errors.UniqueViolation, psycopg2.errors.DuplicateTable):
+                # Another worker created it at the same moment
+                pass
+            self._ready = True
+        return self._execute(sql, params, fetch)
+
+    def _execute(self, sql, params=(), fetch=False):
+        pool = get_pool()
+        conn = pool.getconn()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                row = cursor.fetchone() if fetch else None
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            pool.putconn(conn)
+        return tuple(row.values()) if row is not None else None
+
+
+BACKENDS = {
+    "memory": MemoryBackend,
+    "sqlite": SqliteBackend,
+    "postgres": PostgresBackend,
+}
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_shared_state():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if SHARED_STATE_BACKEND not in BACKENDS:
+                    raise ValueError(f"Unknown SHARED_STATE_BACKEND {SHARED_STATE_BACKEND!r}, expected one of {', '.join(BACKENDS)}")
+                logging.info(f"Using {SHARED_STATE_BACKEND} shared state backend")
+                _backend = BACKENDS[SHARED_STATE_BACKEND]()
+    return _backend
+
+
+class SharedStateStorage(Storage):
+    # Flask-Limiter storage (storage_uri="nisapp://") backed by get_shared_state()
+    STORAGE_SCHEME = ["nisapp"]
+
+    def __init__(self, uri=None, wrap_exceptions=False, **options):
+        super().__init__(uri, wrap_exceptions, **options)
+        self.backend = get_shared_state()
+
+    @property
+    def base_exceptions(self):
+        return (sqlite3.Error, OSError) if isinstance(self.backend, SqliteBackend) else Exception
+
+    def incr(self, key, expiry, amount=1):
+        return self.backend.incr(key, expiry, amount)
+
+    def get(self, key):
+        return self.backend.get(key)
+
+    def get_expiry(self, key):
+        return self.backend.get_expiry(key)
+
+    def check(self):
+        try:
+            return self.backend.check()
+        except Exception:
+            return False
+
+    def reset(self):
+        return self.backend.reset()
+
+    def clear(self, key):
+        self.backend.clear(key)
@@ -103,4 +103,24 @@ document.getElementById("SubmitData").addEventListener("click", (e) => {
 
   e.target.closest("form").submit();
 });
-}
\ No newline at end of file
+}
+const reportJob = document.getElementById("reportJob");
+
+if (reportJob){
+  const pollReportJob = () => {
+    fetch(reportJob.dataset.statusUrl, { credentials: "same-origin" })
+      .then(response => response.json())
+      .then(job => {
+        if (job.status === "done"){
+          document.getElementById("reportJobStatus").textContent = "Report ready";
+          document.getElementById("reportJobLink").classList.remove("d-none");
+        } else if (job.status === "failed" || job.error){
+          document.getElementById("reportJobStatus").textContent = job.error || "Report generation failed";
+        } else {
+          setTimeout(pollReportJob, 2000);
+        }
+      })
+      .catch(() => setTimeout(pollReportJob, 5000));
+  };
+  pollReportJob();
+}
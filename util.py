@@ -1,7 +1,7 @@
 import re
 from datetime import datetime
-from constants import ID_FERNET_KEY
-from cryptography.fernet import Fernet
+from itertools import groupby
+from idTokens import encode_ids
 
 def sanitise_input(strr):
     return "".join(re.findall("[A-Za-z1-9]*", strr))
@@ -13,80 +13,88 @@ def is_valid_date(s):
     except ValueError:
         return False
 
+LEDGER_FIELDS = ("id", "input_type", "type", "subtype", "amount", "receipts", "date_for", "submitted_by", "created_at", "updated_at")
+
+
+class LedgerRow:
+    # Display row for the ledger table; supports row.x and row["x"] like the dicts it replaces
+    __slots__ = LEDGER_FIELDS + ("input_type_rowspan", "type_rowspan", "subtype_rowspan")
+
+    def __getitem__(self, key):
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+
+
+def _format_timestamp(value):
+    return value.strftime("%d %b %Y %H:%M") if isinstance(value, datetime) else value
+
+
+def iter_ledger_rows(rows):
+    # rows must arrive ordered by input_type, type, subtype (see load_ledger_page);
+    # each run of equal keys becomes one rowspan group.
+    tokens = encode_ids([r["id"] for r in rows])
+    indexed = list(zip(tokens, rows))
+    for input_type, it_rows in groupby(indexed, key=lambda p: p[1].get("input_type")):
+        it_rows = list(it_rows)
+        it_rowspan = len(it_rows)
+        for type_name, t_rows in groupby(it_rows, key=lambda p: p[1]["type"]):
+            t_rows = list(t_rows)
+            t_rowspan = len(t_rows)
+            for subtype_name, st_rows in groupby(t_rows, key=lambda p: p[1]["subtype"]):
+                st_rows = list(st_rows)
+                st_rowspan = len(st_rows)
+                for token, r in st_rows:
+                    row = LedgerRow()
+                    row.id = token
+                    row.input_type = input_type
+                    row.type = type_name
+                    row.subtype = subtype_name
+                    row.amount = r["amount"]
+                    row.receipts = r["receipts"]
+                    row.date_for = r["date_for"]
+                    row.submitted_by = r["submitted_by"]
+                    row.created_at = _format_timestamp(r["created_at"])
+                    row.updated_at = _format_timestamp(r["updated_at"])
+                    row.input_type_rowspan = it_rowspan
+                    row.type_rowspan = t_rowspan
+                    row.subtype_rowspan = st_rowspan
+                    yield row
+                    it_rowspan = t_rowspan = st_rowspan = None
+
+
 def group_by_type_subtype(rows):
-    grouped = {}
-    cipher = Fernet(ID_FERNET_KEY)
-
-    for r in rows:
-        it = r.get("input_type", "UNKNOWN")
-        t = r["type"]
-        st = r["subtype"]
-
-        # --- normalize / format here ---
-        row = dict(r)  # avoid mutating original row
-
-        # Format date_for
-        if isinstance(row.get("date_for"), str):
-            try:
-                row["date_for"] = datetime.strptime(
-                    row["date_for"], "%a, %d %b %Y %H:%M:%S GMT"
-                ).strftime("%d %b %Y")
-            except ValueError:
-                pass
-
-        # Format created_at / updated_at
-        for key in ("created_at", "updated_at"):
-            if isinstance(row.get(key), datetime):
-                row[key] = row[key].strftime("%d %b %Y %H:%M")
-
-        row["id"] = cipher.encrypt(str(row["id"]).encode()).decode()
-
-        grouped.setdefault(it, {}).setdefault(t, {}).setdefault(st, []).append(row)
-
-    flat_rows = []
-    for input_type, types in grouped.items():
-        it_rowspan = sum(
-            len(rows) for subtypes in types.values() for rows in subtypes.values()
-        )
-        first_it = True
-
-        for type_name, subtypes in types.items():
-            t_rowspan = sum(len(rows) for rows in subtypes.values())
-            first_t = True
-
-            for subtype_name, rows in subtypes.items():
-                st_rowspan = len(rows)
-                first_st = True
-
-                for row in rows:
-                    row["input_type"] = input_type
-                    row["type"] = type_name
-                    row["subtype"] = subtype_name
-                    row["input_type_rowspan"] = it_rowspan if first_it else None
-                    row["type_rowspan"] = t_rowspan if first_t else None
-                    row["subtype_rowspan"] = st_rowspan if first_st else None
-                    flat_rows.append(row)
-                    first_it = False
-                    first_t = False
-                    first_st = False
-
-    return flat_rows
+    return list(iter_ledger_rows(rows))
+
+# Report rows are tuples selected with REPORT_COLUMNS (plus date_for for ranges)
+REPORT_COLUMNS = "type, input_type, subtype, amount, receipts"
+
 
 def build_db_data(rows):
     data = {}
 
-    for r in rows:
-        t = r["type"]
-        it = r.get("input_type", "UNKNOWN")
-        st = r["subtype"]
-
-        data.setdefault(t, {}).setdefault(it, {}).setdefault(st, []).append([
-            r["amount"],
-            r["receipts"],
-        ])
+    for t, it, st, amount, receipts in rows:
+        data.setdefault(t, {}).setdefault(it, {}).setdefault(st, []).append([amount, receipts])
 
     return data
 
+def build_db_data_by_date(rows):
+    # One pass over a date range: the combined register plus one per date_for.
+    # rows may be a stream, so the row count is returned as well.
+    data = {}
+    by_date = {}
+    count = 0
+
+    for t, it, st, amount, receipts, date_for in rows:
+        entry = [amount, receipts]
+
+        data.setdefault(t, {}).setdefault(it, {}).setdefault(st, []).append(entry)
+        by_date.setdefault(date_for, {}).setdefault(t, {}).setdefault(it, {}).setdefault(st, []).append(entry)
+        count += 1
+
+    return data, by_date, count
+
 def trim_column_map(column_map, excluded_columns):
     trimmed = {}
 
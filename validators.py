@@ -1,13 +1,92 @@
-from datetime import datetime
+import re
+from collections import namedtuple
+from datetime import date, datetime
 from decimal import Decimal, InvalidOperation
+from types import MappingProxyType
+from constants import COLUMN_MAP
 from util import sanitise_input
 
+RECEIPTS_PATTERN = re.compile(r'^[A-Za-z0-9\s\-\.\,\(\)\/\\&@]+$')
+ISO_DATE_PATTERN = re.compile(r"([0-9]{4})-([0-9]{2})-([0-9]{2})")
+RECEIPTS_MAX_LENGTH = 100
+MAX_REPORTED_ERRORS = 50
+
+
 class ValidationError(Exception):
-    pass
+    def __init__(self, message="", errors=None):
+        super().__init__(message)
+        self.errors = errors or [message]
+
+
+# Column positions for one COLUMN_MAP[type][subtype], worked out once at import
+ValidationPlan = namedtuple("ValidationPlan", ["columns", "amount", "receipts", "date"])
+
+
+def compile_plan(allowed_columns):
+    columns = tuple(c["name"].lower() for c in allowed_columns)
+    index = {sanitise_input(name): i for i, name in enumerate(columns)}
+    return ValidationPlan(columns, index["amount"], index["receipts"], index["date"])
+
+
+VALIDATION_PLANS = MappingProxyType({
+    (entry_type, subtype): compile_plan(columns)
+    for entry_type, subtypes in COLUMN_MAP.items()
+    for subtype, columns in subtypes.items()
+})
+
+
+def get_plan(entry_type, subtype):
+    return VALIDATION_PLANS.get((entry_type, subtype))
+
+
+def _valid_amount(value):
+    try:
+        amount = Decimal(value)
+        return amount.is_finite() and amount > 0
+    except (InvalidOperation, TypeError, ValueError):
+        return False
 
 
-def validate_table_data(table_data, allowed_columns):
+def _parse_date(value):
+    # -> the date as YYYY-MM-DD, or None if invalid. Same acceptance as
+    # strptime(value, "%Y-%m-%d"); zero-padded dates (what the form sends)
+    # skip strptime, which dominated validation time
+    try:
+        match = ISO_DATE_PATTERN.fullmatch(value)
+        if match:
+            date(int(match[1]), int(match[2]), int(match[3]))
+            return value
+        return datetime.strptime(value, "%Y-%m-%d").date().isoformat()
+    except (TypeError, ValueError):
+        return None
 
+
+def _row_errors(row_num, row, plan):
+    if not isinstance(row, list):
+        return [f"Row {row_num} is invalid"]
+    if len(row) != len(plan.columns):
+        return [f"Row {row_num} has invalid column count"]
+
+    errors = []
+    if not _valid_amount(row[plan.amount]):
+        errors.append(f"Row {row_num}: Amount must be > 0")
+    if _parse_date(row[plan.date]) is None:
+        errors.append(f"Row {row_num}: Invalid date")
+
+    receipt = row[plan.receipts]
+    if not isinstance(receipt, str):
+        errors.append(f"Row {row_num}: Receipts must be text")
+    elif len(receipt) > RECEIPTS_MAX_LENGTH:
+        errors.append(f"Row {row_num}: Receipts too long")
+    elif not RECEIPTS_PATTERN.match(receipt):
+        errors.append(f"Row {row_num}: Receipts contains invalid characters")
+    return errors
+
+
+def validate_table(table_data, plan):
+    # Checks every row and raises one ValidationError listing all row errors;
+    # returns (amount, receipts, date) per row on success, dates as YYYY-MM-DD
+    # so "2024-1-5" and "2024-01-05" in one batch are the same date
     if not isinstance(table_data, dict):
         raise ValidationError("Invalid table format")
 
@@ -20,42 +99,17 @@ def validate_table_data(table_data, allowed_columns):
     if not isinstance(rows, list) or len(rows) == 0:
         raise ValidationError("At least one row is required")
 
-    received_cols = [h["name"].lower() for h in headings]
-    allowed_cols = [c["name"].lower() for c in allowed_columns]
-
-    if received_cols != allowed_cols:
+    if tuple(h["name"].lower() for h in headings) != plan.columns:
         raise ValidationError("Column mismatch detected")
 
-    col_index = {sanitise_input(name): idx for idx, name in enumerate(received_cols)}
-
+    errors = []
     for row_num, row in enumerate(rows, start=1):
-        if not isinstance(row, list):
-            raise ValidationError(f"Row {row_num} is invalid")
-
-        if len(row) != len(received_cols):
-            raise ValidationError(f"Row {row_num} has invalid column count")
-
-        try:
-            amount = Decimal(row[col_index["amount"]])
-            if amount <= 0:
-                raise ValidationError
-        except (InvalidOperation, ValidationError):
-            raise ValidationError(f"Row {row_num}: Amount must be > 0")
-
-        try:
-            datetime.strptime(row[col_index["date"]], "%Y-%m-%d")
-        except Exception:
-            raise ValidationError(f"Row {row_num}: Invalid date")
-
-        receipt = row[col_index["receipts"]]
-        if not isinstance(receipt, str):
-            raise ValidationError(f"Row {row_num}: Receipts must be text")
-
-        if len(receipt) > 100:
-            raise ValidationError(f"Row {row_num}: Receipts too long")
+        errors.extend(_row_errors(row_num, row, plan))
 
-        import re
-        if not re.match(r'^[A-Za-z0-9\s\-\.\,\(\)\/\\&@]+$', receipt):
-            raise ValidationError(f"Row {row_num}: Receipts contains invalid characters")
+    if errors:
+        reported = errors[:MAX_REPORTED_ERRORS]
+        if len(errors) > MAX_REPORTED_ERRORS:
+            reported.append(f"... and {len(errors) - MAX_REPORTED_ERRORS} more errors")
+        raise ValidationError(reported[0] if len(errors) == 1 else f"{len(errors)} errors in submitted rows", reported)
 
-    return True
+    return [(row[plan.amount], row[plan.receipts], _parse_date(row[plan.date])) for row in rows]